@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Reuse generated answers for near-duplicate questions.
+
+    Entries are bucketed by language and the exact set of retrieved context
+    items, so an answer is only reused when the new question retrieved the same
+    context and its embedding is within ``threshold`` cosine similarity of a
+    cached question. All entries are dropped when the catalog version changes.
+    """
+
+    def __init__(self, threshold: float = 0.95, maxsize: int = 512):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.catalog_version = None
+        self._buckets = {}
+        self._order = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _bucket_key(context_ids: Iterable[Hashable], language: str) -> Tuple[str, Tuple]:
+        return language, tuple(sorted(context_ids))
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+
+    def set_catalog_version(self, version: str):
+        """Record the catalog fingerprint, dropping every entry if it changed."""
+        with self._lock:
+            if version != self.catalog_version:
+                self._buckets.clear()
+                self._order.clear()
+                self.catalog_version = version
+
+    def lookup(self, query_embedding: List[float], context_ids: Iterable[Hashable], language: str) -> Optional[Dict[str, Any]]:
+        """Return the best cached answer for a close-enough question with the same context."""
+        bucket_key = self._bucket_key(context_ids, language)
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            if bucket:
+                queries = list(bucket)
+                matrix = np.stack([bucket[q][0] for q in queries])
+                scores = matrix @ self._normalize(query_embedding)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    matched_query = queries[best]
+                    self._order.move_to_end((bucket_key, matched_query))
+                    self.hits += 1
+                    return {
+                        "answer": bucket[matched_query][1],
+                        "matched_query": matched_query,
+                        "similarity": float(scores[best])
+                    }
+            self.misses += 1
+            return None
+
+    def store(self, query: str, query_embedding: List[float], context_ids: Iterable[Hashable], language: str, answer: str):
+        """Cache ``answer`` for ``query``, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        bucket_key = self._bucket_key(context_ids, language)
+        with self._lock:
+            self._buckets.setdefault(bucket_key, OrderedDict())[query] = (self._normalize(query_embedding), answer)
+            self._order[(bucket_key, query)] = None
+            self._order.move_to_end((bucket_key, query))
+            while len(self._order) > self.maxsize:
+                (old_bucket, old_query), _ = self._order.popitem(last=False)
+                del self._buckets[old_bucket][old_query]
+                if not self._buckets[old_bucket]:
+                    del self._buckets[old_bucket]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._order.clear()
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._order),
+            "max_size": self.maxsize,
+            "similarity_threshold": self.threshold
+        }
+
+
+def create_answer_cache() -> SemanticAnswerCache:
+    """Answer cache configured from ANSWER_CACHE_THRESHOLD and ANSWER_CACHE_SIZE."""
+    return SemanticAnswerCache(
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+    )
@@ -0,0 +1,113 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Hashable, List, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+STOP_WORDS = {
+    "en": {
+        "the", "is", "at", "which", "on", "a", "an", "and", "or", "but", "in", "with", "to", "for", "of", "as", "by",
+        "what", "who", "are", "do", "does", "you", "your", "i", "me", "my", "it", "its", "that", "this", "have", "has",
+        "be", "can", "any", "some", "from", "most", "more", "there", "these", "those", "want", "show"
+    },
+    "fi": {
+        "ja", "on", "ei", "se", "että", "mikä", "mitä", "kuin", "tai", "joka", "jotka", "ovat", "oli", "olla", "minä",
+        "sinä", "hän", "me", "te", "he", "tämä", "tuo", "nämä", "jos", "niin", "myös", "vain", "kanssa", "sekä", "kun",
+        "onko", "minulle", "teillä", "sinulla", "haluan", "jotain", "näytä"
+    }
+}
+
+
+def tokenize(text: str, language: str = "en") -> List[str]:
+    """Lowercase word tokens with the language's stop words removed."""
+    stop_words = STOP_WORDS.get(language, STOP_WORDS["en"])
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in stop_words]
+
+
+class BM25Index:
+    """Okapi BM25 over a tokenized inverted index.
+
+    Only documents that appear in the posting lists of the query terms are
+    scored, so query cost grows with the number of matching documents rather
+    than with catalog size. Matching is on whole tokens, so "sour" never
+    matches inside "flavour".
+
+    The index is thread-safe: searches run on executor threads while the
+    catalog is edited on the event loop, so ``add``, ``remove`` and
+    ``search`` take an internal lock and a search never sees a half-applied
+    edit.
+    """
+
+    def __init__(self, language: str = "en", k1: float = 1.5, b: float = 0.75):
+        self.language = language
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = {}
+        self.doc_terms = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: Hashable, text: str):
+        """Index ``text`` under ``doc_id``, replacing any previous version."""
+        tokens = tokenize(text, self.language)
+        frequencies = Counter(tokens)
+        with self._lock:
+            self._remove(doc_id)
+            for term, frequency in frequencies.items():
+                self.postings.setdefault(term, {})[doc_id] = frequency
+            self.doc_terms[doc_id] = list(frequencies)
+            self.doc_lengths[doc_id] = len(tokens)
+            self.total_length += len(tokens)
+
+    def remove(self, doc_id: Hashable):
+        """Drop ``doc_id`` from the index; unknown ids are ignored."""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: Hashable):
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.doc_terms.pop(doc_id):
+            del self.postings[term][doc_id]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def idf(self, term: str) -> float:
+        with self._lock:
+            return self._idf(term)
+
+    def _idf(self, term: str) -> float:
+        document_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_lengths) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str) -> Dict[Hashable, Tuple[float, List[str]]]:
+        """Score documents containing any query term: ``{doc_id: (score, matched_terms)}``."""
+        terms = list(dict.fromkeys(tokenize(query, self.language)))
+        results = {}
+        with self._lock:
+            if not self.doc_lengths:
+                return {}
+
+            average_length = self.total_length / len(self.doc_lengths) or 1.0
+            for term in terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = self._idf(term)
+                for doc_id, frequency in docs.items():
+                    length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / average_length
+                    score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                    previous_score, matched = results.get(doc_id, (0.0, []))
+                    results[doc_id] = (previous_score + score, matched + [term])
+        return results
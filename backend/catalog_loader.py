@@ -0,0 +1,214 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+# CSV cells holding lists, e.g. "sugar;gelatin;fruit juice"
+LIST_COLUMNS = ("ingredients", "allergens", "flavors")
+CSV_LIST_SEPARATOR = ";"
+
+_INT_PATTERN = re.compile(r"-?\d+")
+_FLOAT_PATTERN = re.compile(r"-?\d*\.\d+")
+
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Catalog records from JSON lines, one object per line; blank lines are skipped."""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on catalog line {number}: {e}") from e
+
+
+def _csv_value(column: str, value: str) -> Any:
+    if column in LIST_COLUMNS:
+        return [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()]
+    if column == "id":
+        return value
+    if _INT_PATTERN.fullmatch(value):
+        return int(value)
+    if _FLOAT_PATTERN.fullmatch(value):
+        return float(value)
+    return value
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Catalog records from CSV with a header row; numbers and list columns are converted."""
+    for row in csv.DictReader(lines):
+        yield {column: _csv_value(column, (value or "").strip()) for column, value in row.items() if column}
+
+
+def catalog_format(filename: str) -> str:
+    """``"jsonl"`` or ``"csv"``, from the file extension."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    raise ValueError(f"Unsupported catalog format {extension!r}; expected .jsonl or .csv")
+
+
+def read_records(stream: TextIO, format: str) -> Iterator[Dict[str, Any]]:
+    """Lazily parse an open text stream in ``format``."""
+    return read_csv(stream) if format == "csv" else read_jsonl(stream)
+
+
+def read_catalog(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily read a JSONL or CSV catalog file; only the current line is held in memory."""
+    format = catalog_format(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        yield from read_records(f, format)
+
+
+def chunked(records: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Consecutive lists of ``size`` items (the last one may be shorter)."""
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class IngestProgress:
+    """Counters of a running or finished catalog load."""
+
+    def __init__(self, source: str = ""):
+        self.source = source
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.records = 0
+        self.chunks = 0
+        self.embedded = 0
+        self._started = 0.0
+        self._finished = 0.0
+
+    def start(self):
+        self.state = "running"
+        self._started = time.perf_counter()
+
+    def finish(self, error: Optional[str] = None):
+        self.state, self.error = ("failed", error) if error else ("done", None)
+        self._finished = time.perf_counter()
+
+    def add_chunk(self, records: int, embedded: int):
+        self.records += records
+        self.embedded += embedded
+        self.chunks += 1
+
+    @property
+    def elapsed(self) -> float:
+        if self.state == "idle":
+            return 0.0
+        end = self._finished if self.state in ("done", "failed") else time.perf_counter()
+        return end - self._started
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = self.elapsed
+        snapshot = {
+            "source": self.source,
+            "state": self.state,
+            "records": self.records,
+            "chunks": self.chunks,
+            "embedded_documents": self.embedded,
+            "elapsed_seconds": elapsed,
+            "records_per_second": self.records / elapsed if elapsed > 0 else 0.0,
+            "embedded_per_second": self.embedded / elapsed if elapsed > 0 else 0.0
+        }
+        if self.error:
+            snapshot["error"] = self.error
+        return snapshot
+
+
+class CatalogLoader:
+    """Stream catalog records through a chunk handler with bounded concurrency.
+
+    Records are pulled lazily (on a dedicated reader thread, so file reads
+    never block the event loop) in chunks of ``chunk_size`` and handed to ``process_chunk``,
+    which embeds and indexes one chunk and returns how many documents it
+    embedded. At most ``concurrency`` chunks are in flight, so memory stays
+    at ``chunk_size * concurrency`` records whatever the catalog size.
+    """
+
+    def __init__(self, chunk_size: int = 256, concurrency: int = 2, log_every: int = 20):
+        self.chunk_size = chunk_size
+        self.concurrency = max(1, concurrency)
+        self.log_every = log_every
+        self.progress = IngestProgress()
+
+    async def load(
+        self,
+        records: Iterable[Dict[str, Any]],
+        process_chunk: Callable[[List[Dict[str, Any]]], Awaitable[int]],
+        source: str = ""
+    ) -> Dict[str, Any]:
+        """Run every chunk of ``records`` through ``process_chunk``; returns the final progress snapshot."""
+        if self.progress.state == "running":
+            raise RuntimeError(f"A catalog load from {self.progress.source or 'a stream'} is already running")
+        progress = self.progress = IngestProgress(source)
+        progress.start()
+        loop = asyncio.get_running_loop()
+        chunks = chunked(records, self.chunk_size)
+        # One reader thread: generators must not be resumed or closed from two threads at once
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-reader")
+
+        async def run(chunk: List[Dict[str, Any]]):
+            embedded = await process_chunk(chunk)
+            progress.add_chunk(len(chunk), embedded)
+            if progress.chunks % self.log_every == 0:
+                snapshot = progress.snapshot()
+                logger.info(f"Catalog load: {snapshot['records']} records, {snapshot['records_per_second']:.0f} records/s")
+
+        in_flight = set()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(reader, next, chunks, None)
+                if chunk is None:
+                    break
+                in_flight.add(asyncio.ensure_future(run(chunk)))
+                if len(in_flight) >= self.concurrency:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        except BaseException as e:
+            for task in in_flight:
+                task.cancel()
+            progress.finish(error=str(e) or type(e).__name__)
+            raise
+        finally:
+            # Close the underlying file of a generator that was not read to the end.
+            # On cancellation a next() may still be running on the reader thread;
+            # queueing close() behind it avoids "generator already executing".
+            close = getattr(records, "close", None)
+            if close is not None:
+                reader.submit(close)
+            reader.shutdown(wait=False)
+
+        progress.finish()
+        snapshot = progress.snapshot()
+        logger.info(
+            f"Catalog load finished: {snapshot['records']} records in {snapshot['elapsed_seconds']:.2f}s "
+            f"({snapshot['records_per_second']:.0f} records/s, {snapshot['embedded_documents']} documents embedded)"
+        )
+        return snapshot
+
+
+def create_catalog_loader() -> CatalogLoader:
+    """Loader sized by INGEST_CHUNK_SIZE records per chunk and INGEST_CONCURRENCY chunks in flight."""
+    return CatalogLoader(
+        chunk_size=int(os.getenv("INGEST_CHUNK_SIZE", "256")),
+        concurrency=int(os.getenv("INGEST_CONCURRENCY", "2"))
+    )
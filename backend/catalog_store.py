@@ -0,0 +1,293 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from bm25 import tokenize
+
+# Stay well below SQLite's bound-parameter limit
+_BATCH = 500
+
+LANGUAGES = ("en", "fi")
+
+
+def _batches(items: Sequence[Any]) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), _BATCH):
+        yield items[start:start + _BATCH]
+
+
+class CatalogStore:
+    """Disk-backed catalog: candy records, their vector database documents and a BM25 keyword index.
+
+    Records are stored as JSON rows in catalog order and loaded on demand, so
+    a large catalog is never held in memory. Each candy's searchable text is
+    indexed per language in an FTS5 table ranked with SQLite's ``bm25()``;
+    text is pre-tokenized with ``bm25.tokenize`` so stop words and whole-token
+    matching follow the in-memory ``BM25Index``. The ``documents`` table
+    mirrors the vector database: which chunk documents hold each candy, and
+    the content/record hashes that decide re-embedding.
+
+    The default path ``""`` is a private temporary database that SQLite
+    deletes when its connection closes. The connection is opened on first use
+    in each process, so a forked worker starts with an empty store of its own
+    and never shares a connection across the fork. All calls block and are
+    serialized by a lock; run them off the event loop.
+    """
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._size = 0
+        self._document_counts = Counter()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection, opened (and the schema created) on first use; call with ``_lock`` held."""
+        if self._conn is None or self._pid != os.getpid():
+            # A connection inherited across fork is dropped, never used or closed
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS candies ("
+                    " row INTEGER PRIMARY KEY AUTOINCREMENT,"
+                    " id TEXT NOT NULL UNIQUE,"
+                    " record TEXT NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS documents ("
+                    " doc_id TEXT PRIMARY KEY,"
+                    " candy_id TEXT,"
+                    " language TEXT,"
+                    " content_hash TEXT,"
+                    " record_hash TEXT)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS documents_candy ON documents (candy_id)")
+                for language in LANGUAGES:
+                    # Tokens are already split and filtered; keep diacritics so "mitä" != "mita"
+                    conn.execute(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS keywords_{language}"
+                        " USING fts5(tokens, tokenize = 'unicode61 remove_diacritics 0')"
+                    )
+            self._size = conn.execute("SELECT COUNT(*) FROM candies").fetchone()[0]
+            self._document_counts = Counter(dict(conn.execute(
+                "SELECT language, COUNT(*) FROM documents WHERE language IS NOT NULL GROUP BY language"
+            ).fetchall()))
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def __len__(self) -> int:
+        # Kept current by the writers, so reading it never waits on the lock
+        return self._size if self._pid == os.getpid() else 0
+
+    # Records
+
+    def put_records(self, records: Iterable[Tuple[Dict[str, Any], Dict[str, str]]]):
+        """Add or replace records, each given with its searchable text per language.
+
+        A replaced record keeps its position in the catalog.
+        """
+        added = 0
+        with self._lock:
+            with self._connection() as conn:
+                for record, texts in records:
+                    row = conn.execute("SELECT row FROM candies WHERE id = ?", (record["id"],)).fetchone()
+                    data = json.dumps(record, ensure_ascii=False)
+                    if row is None:
+                        row = conn.execute("INSERT INTO candies (id, record) VALUES (?, ?)", (record["id"], data)).lastrowid
+                        added += 1
+                    else:
+                        row = row[0]
+                        conn.execute("UPDATE candies SET record = ? WHERE row = ?", (data, row))
+                    for language in LANGUAGES:
+                        conn.execute(f"DELETE FROM keywords_{language} WHERE rowid = ?", (row,))
+                        conn.execute(
+                            f"INSERT INTO keywords_{language} (rowid, tokens) VALUES (?, ?)",
+                            (row, " ".join(tokenize(texts.get(language, ""), language)))
+                        )
+            # Counters change only once the transaction has committed
+            self._size += added
+
+    def delete_records(self, candy_ids: Sequence[str]):
+        """Remove records and their keyword entries; unknown ids are ignored."""
+        removed = 0
+        with self._lock:
+            with self._connection() as conn:
+                for batch in _batches(list(dict.fromkeys(candy_ids))):
+                    placeholders = ",".join("?" * len(batch))
+                    rows = [(row,) for (row,) in conn.execute(f"SELECT row FROM candies WHERE id IN ({placeholders})", batch)]
+                    for language in LANGUAGES:
+                        conn.executemany(f"DELETE FROM keywords_{language} WHERE rowid = ?", rows)
+                    conn.executemany("DELETE FROM candies WHERE row = ?", rows)
+                    removed += len(rows)
+            self._size -= removed
+
+    def clear_records(self):
+        """Forget every record (documents are kept; they mirror the vector database)."""
+        with self._lock:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM candies")
+                for language in LANGUAGES:
+                    conn.execute(f"DELETE FROM keywords_{language}")
+            self._size = 0
+
+    def get_many(self, candy_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Records by id; unknown ids are omitted."""
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for batch in _batches(list(dict.fromkeys(candy_ids))):
+                placeholders = ",".join("?" * len(batch))
+                for candy_id, data in conn.execute(f"SELECT id, record FROM candies WHERE id IN ({placeholders})", batch):
+                    found[candy_id] = json.loads(data)
+        return found
+
+    def existing_ids(self, candy_ids: Iterable[str]) -> Set[str]:
+        """The subset of ``candy_ids`` in the catalog."""
+        found = set()
+        with self._lock:
+            conn = self._connection()
+            for batch in _batches(list(dict.fromkeys(candy_ids))):
+                placeholders = ",".join("?" * len(batch))
+                found.update(candy_id for (candy_id,) in conn.execute(f"SELECT id FROM candies WHERE id IN ({placeholders})", batch))
+        return found
+
+    def iter_records(self, page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Every record in catalog order, read a page at a time."""
+        last = 0
+        while True:
+            with self._lock:
+                page = self._connection().execute(
+                    "SELECT row, record FROM candies WHERE row > ? ORDER BY row LIMIT ?", (last, page_size)
+                ).fetchall()
+            for _, data in page:
+                yield json.loads(data)
+            if len(page) < page_size:
+                return
+            last = page[-1][0]
+
+    # Keyword search
+
+    def search_keywords(self, query: str, language: str, top_n: int, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Candy ids ranked by BM25 score of ``query`` against their ``language`` text, best first."""
+        terms = list(dict.fromkeys(tokenize(query, language)))
+        if not terms or top_n <= 0:
+            return []
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        table = f"keywords_{language if language in LANGUAGES else 'en'}"
+        ranked = []
+        with self._lock:
+            # bm25() is lower-is-better; negate it so higher scores rank first
+            cursor = self._connection().execute(
+                f"SELECT candies.id, -bm25({table}) FROM {table} JOIN candies ON candies.row = {table}.rowid"
+                f" WHERE {table} MATCH ? ORDER BY bm25({table})" + ("" if allowed is not None else " LIMIT ?"),
+                (match,) if allowed is not None else (match, top_n)
+            )
+            for candy_id, score in cursor:
+                if allowed is not None and candy_id not in allowed:
+                    continue
+                ranked.append((candy_id, score))
+                if len(ranked) == top_n:
+                    break
+        return ranked
+
+    # Vector database documents
+
+    def put_documents(self, documents: Iterable[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]]):
+        """Record ``(doc_id, candy_id, language, content_hash, record_hash)`` rows, replacing earlier ones."""
+        counts = Counter()
+        with self._lock:
+            with self._connection() as conn:
+                for document in documents:
+                    previous = conn.execute("SELECT language FROM documents WHERE doc_id = ?", (document[0],)).fetchone()
+                    if previous is not None and previous[0] is not None:
+                        counts[previous[0]] -= 1
+                    conn.execute(
+                        "INSERT OR REPLACE INTO documents (doc_id, candy_id, language, content_hash, record_hash)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        document
+                    )
+                    if document[2] is not None:
+                        counts[document[2]] += 1
+            self._document_counts.update(counts)
+
+    def delete_documents(self, doc_ids: Sequence[str]):
+        """Forget documents; unknown ids are ignored."""
+        counts = Counter()
+        with self._lock:
+            with self._connection() as conn:
+                for batch in _batches(list(dict.fromkeys(doc_ids))):
+                    placeholders = ",".join("?" * len(batch))
+                    for (language,) in conn.execute(f"SELECT language FROM documents WHERE doc_id IN ({placeholders})", batch):
+                        if language is not None:
+                            counts[language] += 1
+                    conn.execute(f"DELETE FROM documents WHERE doc_id IN ({placeholders})", batch)
+            self._document_counts.subtract(counts)
+
+    def clear_documents(self):
+        """Forget every document, e.g. before reloading them from the vector database."""
+        with self._lock:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM documents")
+            self._document_counts = Counter()
+
+    def document_hashes(self, doc_ids: Sequence[str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """``{doc_id: (content_hash, record_hash)}`` of the stored documents among ``doc_ids``."""
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for batch in _batches(list(doc_ids)):
+                placeholders = ",".join("?" * len(batch))
+                for doc_id, content, record in conn.execute(
+                    f"SELECT doc_id, content_hash, record_hash FROM documents WHERE doc_id IN ({placeholders})", batch
+                ):
+                    found[doc_id] = (content, record)
+        return found
+
+    def candy_documents(self, candy_ids: Iterable[str], language: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+        """``{candy_id: {doc_id: language}}`` for the candies among ``candy_ids`` that have documents."""
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for batch in _batches(list(dict.fromkeys(candy_ids))):
+                placeholders = ",".join("?" * len(batch))
+                query = f"SELECT candy_id, doc_id, language FROM documents WHERE candy_id IN ({placeholders})"
+                params = list(batch)
+                if language is not None:
+                    query += " AND language = ?"
+                    params.append(language)
+                for candy_id, doc_id, doc_language in conn.execute(query + " ORDER BY doc_id", params):
+                    found.setdefault(candy_id, {})[doc_id] = doc_language
+        return found
+
+    def document_count(self, language: str, candy_ids: Optional[Iterable[str]] = None) -> int:
+        """Documents in ``language``, of all candies or only of ``candy_ids``."""
+        with self._lock:
+            conn = self._connection()
+            if candy_ids is None:
+                return self._document_counts[language]
+            total = 0
+            for batch in _batches(list(dict.fromkeys(candy_ids))):
+                placeholders = ",".join("?" * len(batch))
+                total += conn.execute(
+                    f"SELECT COUNT(*) FROM documents WHERE language = ? AND candy_id IN ({placeholders})",
+                    [language, *batch]
+                ).fetchone()[0]
+            return total
+
+    def orphan_documents(self) -> List[str]:
+        """Documents no record claims: those of removed candies and legacy ones without a candy id."""
+        with self._lock:
+            return [doc_id for (doc_id,) in self._connection().execute(
+                "SELECT doc_id FROM documents WHERE candy_id IS NULL OR candy_id NOT IN (SELECT id FROM candies)"
+            )]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = self._pid = None
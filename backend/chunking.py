@@ -0,0 +1,99 @@
+import logging
+import os
+import re
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+_TOKEN_PATTERN = re.compile(r"\S+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of ``text``, split after ., ! or ? followed by whitespace."""
+    return [sentence for sentence in _SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+
+def count_tokens(text: str) -> int:
+    """Whitespace-delimited tokens, a cheap stand-in for the embedding model's word pieces."""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+class Chunker:
+    """Split long text into overlapping chunks of at most ``max_tokens`` tokens.
+
+    ``mode="sentence"`` packs whole sentences into each chunk (a sentence
+    longer than the limit is split into token windows) and starts the next
+    chunk with the trailing sentences of the previous one, up to
+    ``overlap`` tokens. ``mode="token"`` uses fixed windows of
+    ``max_tokens`` tokens that advance by ``max_tokens - overlap``. Text
+    that fits the limit comes back as a single chunk, unchanged.
+    """
+
+    def __init__(self, mode: str = "sentence", max_tokens: int = 128, overlap: int = 32):
+        if mode not in ("sentence", "token"):
+            raise ValueError(f"Unknown chunking mode {mode!r}; expected 'sentence' or 'token'")
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("Chunk overlap must be smaller than the chunk size")
+        self.mode = mode
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+
+    def split(self, text: str) -> List[str]:
+        text = text.strip()
+        if count_tokens(text) <= self.max_tokens:
+            return [text] if text else []
+        if self.mode == "token":
+            return self._token_windows(_TOKEN_PATTERN.findall(text))
+        return self._sentence_chunks(text)
+
+    def _token_windows(self, tokens: List[str]) -> List[str]:
+        step = self.max_tokens - self.overlap
+        chunks = []
+        for start in range(0, len(tokens), step):
+            chunks.append(" ".join(tokens[start:start + self.max_tokens]))
+            if start + self.max_tokens >= len(tokens):
+                break
+        return chunks
+
+    def _sentence_chunks(self, text: str) -> List[str]:
+        # (sentence, token count) pieces, with over-long sentences pre-split
+        pieces = []
+        for sentence in split_sentences(text):
+            tokens = count_tokens(sentence)
+            if tokens > self.max_tokens:
+                pieces.extend((window, count_tokens(window)) for window in self._token_windows(_TOKEN_PATTERN.findall(sentence)))
+            else:
+                pieces.append((sentence, tokens))
+
+        chunks, current, current_tokens = [], [], 0
+        for sentence, tokens in pieces:
+            if current and current_tokens + tokens > self.max_tokens:
+                chunks.append(" ".join(piece for piece, _ in current))
+                # Carry trailing sentences into the next chunk as overlap
+                carried, carried_tokens = [], 0
+                for piece, piece_tokens in reversed(current):
+                    if carried_tokens + piece_tokens > self.overlap or carried_tokens + piece_tokens + tokens > self.max_tokens:
+                        break
+                    carried.insert(0, (piece, piece_tokens))
+                    carried_tokens += piece_tokens
+                current, current_tokens = carried, carried_tokens
+            current.append((sentence, tokens))
+            current_tokens += tokens
+        if current:
+            chunks.append(" ".join(piece for piece, _ in current))
+        return chunks
+
+    def config(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "max_tokens": self.max_tokens, "overlap": self.overlap}
+
+
+def create_chunker() -> Chunker:
+    """Chunker configured by CHUNK_MODE ("sentence" or "token"), CHUNK_MAX_TOKENS and CHUNK_OVERLAP."""
+    chunker = Chunker(
+        mode=os.getenv("CHUNK_MODE", "sentence"),
+        max_tokens=int(os.getenv("CHUNK_MAX_TOKENS", "128")),
+        overlap=int(os.getenv("CHUNK_OVERLAP", "32"))
+    )
+    logger.info(f"Chunking: {chunker.config()}")
+    return chunker
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency comparison of the embedding backends.
+
+Embeds the candy catalog and a set of sample questions with every backend
+and compares each one against eager PyTorch (SentenceTransformer):
+
+- cosine similarity between the two backends' vectors for the same text
+- top-1 / top-3 agreement when ranking the catalog for each question
+- single-query latency (p50 / p95) and batch throughput
+
+    python compare_embedders.py --backends torch onnx onnx-int8
+"""
+
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from rag_service import DEMO_CANDIES, RAGService, load_embedding_model
+
+SAMPLE_QUERIES = [
+    "What sour candy do you have?",
+    "I want something with chocolate",
+    "Which candy is the sweetest?",
+    "Do you have anything without gelatin?",
+    "Recommend a fruity gummy for kids",
+    "Something cheap and crunchy",
+    "Mitä suklaata teillä on?",
+    "Onko teillä happamia karkkeja?",
+    "Haluan jotain makeaa ja pehmeää",
+    "Mikä karkki sopii lapsille?"
+]
+
+
+def catalog_texts() -> List[str]:
+    """Searchable texts of the demo catalog, both languages, as indexed by RAGService."""
+    return [text for candy in DEMO_CANDIES for text in RAGService._search_texts(candy).values()]
+
+
+def percentile_ms(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000.0)
+
+
+def measure_latency(model, queries: List[str], runs: int) -> Dict[str, float]:
+    """Single-text latency over ``runs`` passes of the queries."""
+    model.encode(queries[:1])  # Warm-up
+    samples = []
+    for _ in range(runs):
+        for query in queries:
+            start = time.perf_counter()
+            model.encode([query])
+            samples.append(time.perf_counter() - start)
+    return {"p50_ms": percentile_ms(samples, 50), "p95_ms": percentile_ms(samples, 95)}
+
+
+def measure_throughput(model, texts: List[str], batch_size: int, repeat: int) -> float:
+    """Texts per second when encoding ``texts`` (repeated) in batches."""
+    workload = texts * repeat
+    start = time.perf_counter()
+    model.encode(workload, batch_size=batch_size)
+    return len(workload) / (time.perf_counter() - start)
+
+
+def ranking_agreement(reference: np.ndarray, candidate: np.ndarray, documents_ref: np.ndarray, documents_cand: np.ndarray, k: int = 3) -> Dict[str, float]:
+    """How often the candidate backend ranks the catalog like the reference."""
+    top1, overlap = 0, 0.0
+    for query_ref, query_cand in zip(reference, candidate):
+        ranked_ref = np.argsort(-(documents_ref @ query_ref))[:k]
+        ranked_cand = np.argsort(-(documents_cand @ query_cand))[:k]
+        top1 += int(ranked_ref[0] == ranked_cand[0])
+        overlap += len(set(ranked_ref) & set(ranked_cand)) / k
+    return {"top1_agreement": top1 / len(reference), f"overlap_at_{k}": overlap / len(reference)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends against eager PyTorch")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--runs", type=int, default=5, help="Passes over the sample queries for latency")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=20, help="Catalog repetitions for the throughput test")
+    args = parser.parse_args()
+
+    documents = catalog_texts()
+    reference_model = load_embedding_model(args.model, backend="torch")
+    reference_docs = np.asarray(reference_model.encode(documents), dtype=np.float32)
+    reference_queries = np.asarray(reference_model.encode(SAMPLE_QUERIES), dtype=np.float32)
+
+    rows = []
+    for backend in args.backends:
+        start = time.perf_counter()
+        model = reference_model if backend == "torch" else load_embedding_model(args.model, backend=backend)
+        load_time = time.perf_counter() - start
+
+        docs = np.asarray(model.encode(documents), dtype=np.float32)
+        queries = np.asarray(model.encode(SAMPLE_QUERIES), dtype=np.float32)
+        cosines = np.concatenate([
+            np.sum(docs * reference_docs, axis=1),
+            np.sum(queries * reference_queries, axis=1)
+        ])
+
+        rows.append({
+            "backend": backend,
+            "load_s": load_time,
+            "mean_cosine": float(cosines.mean()),
+            "min_cosine": float(cosines.min()),
+            **ranking_agreement(reference_queries, queries, reference_docs, docs),
+            **measure_latency(model, SAMPLE_QUERIES, args.runs),
+            "texts_per_s": measure_throughput(model, documents, args.batch_size, args.repeat)
+        })
+
+    columns = ["backend", "load_s", "mean_cosine", "min_cosine", "top1_agreement", "overlap_at_3", "p50_ms", "p95_ms", "texts_per_s"]
+    print(" | ".join(f"{column:>14}" for column in columns))
+    for row in rows:
+        print(" | ".join(
+            f"{row[column]:>14}" if isinstance(row[column], str) else f"{row[column]:>14.4f}"
+            for column in columns
+        ))
+
+
+if __name__ == "__main__":
+    main()
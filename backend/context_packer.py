@@ -0,0 +1,258 @@
+import base64
+import logging
+import math
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from chunking import split_sentences
+
+logger = logging.getLogger(__name__)
+
+# Bundled BPE files, named <encoding>.tiktoken; never downloaded at runtime
+TOKENIZER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokenizers")
+
+# Split pattern and special tokens of the encodings that can be loaded from a
+# local file, and where fetch_tokenizer.py gets that file at build time
+ENCODINGS = {
+    "cl100k_base": {
+        "url": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+        "sha256": "223921b76ee99bde995b7ff738513eef100fb51d18c93597a113bcffe865b2a7",
+        "pat_str": r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+""",
+        "special_tokens": {
+            "<|endoftext|>": 100257,
+            "<|fim_prefix|>": 100258,
+            "<|fim_middle|>": 100259,
+            "<|fim_suffix|>": 100260,
+            "<|endofprompt|>": 100276
+        }
+    }
+}
+
+# Approximates the cl100k pre-tokenizer: contractions, words with their
+# leading space, 1-3 digit runs, punctuation runs and whitespace
+_PIECE_PATTERN = re.compile(r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+")
+# Characters per BPE token assumed for long words in the approximation
+_CHARS_PER_TOKEN = 6
+
+# Chat-format overhead of the gpt-3.5/gpt-4 family: every message is wrapped
+# in a few special tokens, and the reply is primed with a few more
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+def load_bpe_ranks(path: str) -> Dict[bytes, int]:
+    """Mergeable ranks from a ``.tiktoken`` file: one "<base64 token> <rank>" per line."""
+    ranks = {}
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                token, rank = line.split()
+                ranks[base64.b64decode(token)] = int(rank)
+    return ranks
+
+
+class Tokenizer:
+    """Offline token counter for OpenAI chat models.
+
+    Counts with tiktoken's BPE when the package is installed and the
+    encoding's ``<encoding>.tiktoken`` file is in ``bpe_dir``; the file is
+    read from disk, never downloaded. Otherwise token counts come from a
+    regex approximation of the same pre-tokenizer that counts long words as
+    several tokens, erring on the side of overcounting so a budget is never
+    exceeded by much. The encoding is loaded on first use or by ``load()``
+    during warm-up; ``exact`` tells which counter is in use.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base", bpe_dir: Optional[str] = None):
+        self.encoding_name = encoding_name
+        self.bpe_path = os.path.join(bpe_dir or TOKENIZER_DIR, f"{encoding_name}.tiktoken")
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> "Tokenizer":
+        """Load the BPE encoding from ``bpe_path`` if possible (idempotent, blocking)."""
+        with self._lock:
+            if self._loaded:
+                return self
+            try:
+                import tiktoken
+                params = ENCODINGS[self.encoding_name]
+                self._encoding = tiktoken.Encoding(
+                    self.encoding_name,
+                    pat_str=params["pat_str"],
+                    mergeable_ranks=load_bpe_ranks(self.bpe_path),
+                    special_tokens=params["special_tokens"]
+                )
+                logger.info(f"Loaded {self.encoding_name} tokenizer from {self.bpe_path}")
+            except Exception as e:
+                logger.warning(
+                    f"{self.encoding_name} tokenizer unavailable ({e!r}); token counts are approximate. "
+                    f"Run `python fetch_tokenizer.py` to install {self.bpe_path}"
+                )
+            self._loaded = True
+        return self
+
+    @property
+    def exact(self) -> bool:
+        return self.load()._encoding is not None
+
+    @property
+    def name(self) -> str:
+        return f"tiktoken/{self.encoding_name}" if self.exact else "regex-approximation"
+
+    @property
+    def accuracy(self) -> str:
+        """"exact" or "approximate", for labelling reported token counts."""
+        return "exact" if self.exact else "approximate"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.load()._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return sum(max(1, math.ceil(len(piece) / _CHARS_PER_TOKEN)) for piece in _PIECE_PATTERN.findall(text))
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Prompt tokens of a chat completion request, including the chat-format overhead."""
+        return TOKENS_PER_REPLY + sum(
+            TOKENS_PER_MESSAGE + self.count(message["role"]) + self.count(message["content"])
+            for message in messages
+        )
+
+
+def _sentence_key(sentence: str) -> str:
+    return " ".join(re.findall(r"\w+", sentence.lower()))
+
+
+class ContextPacker:
+    """Fill a token budget with retrieved passages, most relevant first.
+
+    ``pack`` takes blocks in relevance order, each a dict with a ``key``, a
+    fixed ``header`` and ``footer`` (name, metadata) and a list of text
+    ``passages``. Sentences already packed from an earlier block, or
+    repeated within a block (e.g. the overlap of neighbouring chunks), are
+    dropped. A block is then added whole if it fits the remaining budget,
+    or with as many of its leading sentences as fit; a block whose header
+    and footer alone do not fit is skipped, and smaller blocks further down
+    the ranking may still take the space.
+    """
+
+    def __init__(self, tokenizer: Tokenizer, budget: int = 1024, separator: str = "\n", passage_separator: str = " [...] "):
+        self.tokenizer = tokenizer
+        self.budget = budget
+        self.separator = separator
+        self.passage_separator = passage_separator
+
+    def _render(self, block: Dict[str, Any], passages: List[List[str]]) -> str:
+        body = self.passage_separator.join(" ".join(sentences) for sentences in passages if sentences)
+        return f"{block.get('header', '')}{body}{block.get('footer', '')}"
+
+    def pack(self, blocks: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Packed context text and a report of what was kept, trimmed and dropped."""
+        count = self.tokenizer.count
+        separator_tokens = count(self.separator)
+        seen = set()
+        parts, packed, dropped = [], [], []
+        used = candidate_tokens = duplicates = 0
+
+        for position, block in enumerate(blocks):
+            candidate_tokens += (separator_tokens if position else 0) + count(self._render(block, [split_sentences(p) for p in block.get("passages", [])]))
+
+            # Flatten to (passage, sentence) pairs, skipping repeated sentences
+            sentences, block_keys = [], set()
+            for index, passage in enumerate(block.get("passages", [])):
+                for sentence in split_sentences(passage):
+                    key = _sentence_key(sentence)
+                    if key in seen or key in block_keys:
+                        duplicates += 1
+                        continue
+                    block_keys.add(key)
+                    sentences.append((index, sentence, key))
+
+            remaining = self.budget - used - (separator_tokens if parts else 0)
+            if count(self._render(block, [])) > remaining:
+                dropped.append(block["key"])
+                continue
+
+            # Greedily take leading sentences, then trim on the exact count
+            kept, estimate = [], count(self._render(block, []))
+            for item in sentences:
+                cost = count(item[1]) + 1
+                if estimate + cost > remaining:
+                    break
+                kept.append(item)
+                estimate += cost
+            while True:
+                passages: Dict[int, List[str]] = {}
+                for index, sentence, _ in kept:
+                    passages.setdefault(index, []).append(sentence)
+                text = self._render(block, [passages[index] for index in sorted(passages)])
+                tokens = count(text)
+                if tokens <= remaining or not kept:
+                    break
+                kept.pop()
+            if sentences and not kept:
+                # Not even the first new sentence fits; the name alone is no help
+                dropped.append(block["key"])
+                continue
+
+            seen.update(key for _, _, key in kept)
+            parts.append(text)
+            used += tokens + (separator_tokens if len(parts) > 1 else 0)
+            packed.append({
+                "key": block["key"],
+                "tokens": tokens,
+                "passages": len(passages),
+                "sentences": len(kept),
+                "truncated": len(kept) < len(sentences)
+            })
+
+        text = self.separator.join(parts)
+        tokens = count(text)
+        # Merges across separators can shift the total by a token or two
+        while tokens > self.budget and parts:
+            parts.pop()
+            dropped.append(packed.pop()["key"])
+            text = self.separator.join(parts)
+            tokens = count(text)
+
+        return {
+            "text": text,
+            "tokens": tokens,
+            "budget": self.budget,
+            "blocks": packed,
+            "dropped": dropped,
+            "duplicate_sentences": duplicates,
+            "candidate_tokens": candidate_tokens
+        }
+
+    def report(self, packed: Dict[str, Any]) -> Dict[str, Any]:
+        """Summary of a ``pack`` result for step data."""
+        return {
+            "tokenizer": self.tokenizer.name,
+            "exact_counts": self.tokenizer.exact,
+            "token_counts": self.tokenizer.accuracy,
+            "context_tokens": packed["tokens"],
+            "token_budget": packed["budget"],
+            "utilization": f"{packed['tokens'] / packed['budget'] * 100:.1f}%" if packed["budget"] else "n/a",
+            "candidate_tokens": packed["candidate_tokens"],
+            "tokens_saved": max(0, packed["candidate_tokens"] - packed["tokens"]),
+            "blocks_included": len(packed["blocks"]),
+            "blocks_truncated": sum(1 for block in packed["blocks"] if block["truncated"]),
+            "blocks_dropped": len(packed["dropped"]),
+            "duplicate_sentences_removed": packed["duplicate_sentences"]
+        }
+
+
+def create_context_packer() -> ContextPacker:
+    """Packer filling CONTEXT_TOKEN_BUDGET tokens, counted with the TOKENIZER_ENCODING encoding from TOKENIZER_DIR.
+
+    The tokenizer is not loaded here; call ``packer.tokenizer.load()`` during warm-up.
+    """
+    return ContextPacker(
+        Tokenizer(os.getenv("TOKENIZER_ENCODING", "cl100k_base"), os.getenv("TOKENIZER_DIR")),
+        budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1024"))
+    )
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+class EmbeddingStore:
+    """Disk-backed, content-addressed store for embedding vectors.
+
+    Vectors are keyed by a SHA-256 of the embedding model name and the exact
+    input text, so an entry stays valid for as long as neither changes. Several
+    processes can share one store file; SQLite handles the locking.
+
+    The SQLite connection is opened on first use in each process: services
+    are constructed before serve.py forks its workers, and a connection must
+    not be shared across a fork.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection, opened (and the schema created) on first use; call with ``_lock`` held."""
+        if self._conn is None or self._pid != os.getpid():
+            # A connection inherited across fork is dropped, never used or closed
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    " key TEXT PRIMARY KEY,"
+                    " model TEXT NOT NULL,"
+                    " dimensions INTEGER NOT NULL,"
+                    " vector BLOB NOT NULL)"
+                )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Content address of one (model, input text) pair."""
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return the stored vectors for ``texts``, keyed by text. Misses are omitted."""
+        keys = {self.make_key(model, text): text for text in texts}
+        found = {}
+        key_list = list(keys)
+
+        with self._lock:
+            conn = self._connection()
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(key_list), 500):
+                batch = key_list[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = np.frombuffer(blob, dtype=np.float32)
+
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        """Store vectors keyed by their input text."""
+        rows = []
+        for text, vector in items.items():
+            array = np.asarray(vector, dtype=np.float32)
+            rows.append((self.make_key(model, text), model, int(array.shape[0]), array.tobytes()))
+
+        with self._lock, self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimensions, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = self._pid = None
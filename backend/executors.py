@@ -0,0 +1,127 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_call(fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Tuple[Any, float, float]:
+    """Run ``fn`` and report when it started and finished (wall clock, valid across processes)."""
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return result, started, time.time()
+
+
+class InstrumentedExecutor(concurrent.futures.Executor):
+    """Thread or process pool that keeps queue-depth and utilisation counters.
+
+    Usable anywhere an executor is accepted, including
+    ``loop.run_in_executor``. Process pools use the "spawn" start method, so
+    submitted callables must be picklable module-level functions; load
+    heavy state in the workers through ``initializer``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = "thread",
+        max_workers: int = 4,
+        initializer: Optional[Callable] = None,
+        initargs: Tuple = ()
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind {kind!r}; expected 'thread' or 'process'")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        if kind == "process":
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=initargs
+            )
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix=name,
+                initializer=initializer,
+                initargs=initargs
+            )
+        self._lock = threading.Lock()
+        self._created = time.time()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._busy_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        outer = concurrent.futures.Future()
+        submitted = time.time()
+        with self._lock:
+            self._in_flight += 1
+        inner = self._executor.submit(_timed_call, fn, args, kwargs)
+
+        def finish(done: concurrent.futures.Future):
+            try:
+                result, started, finished = done.result()
+            except BaseException as e:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._failed += 1
+                outer.set_exception(e)
+                return
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                self._busy_seconds += finished - started
+                self._wait_seconds += max(0.0, started - submitted)
+            outer.set_result(result)
+
+        inner.add_done_callback(finish)
+        return outer
+
+    def shutdown(self, wait: bool = True, **kwargs):
+        self._executor.shutdown(wait=wait, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and utilisation since the executor was created."""
+        with self._lock:
+            running = min(self._in_flight, self.max_workers)
+            finished = self._completed + self._failed
+            uptime = max(time.time() - self._created, 1e-9)
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "running": running,
+                "queued": self._in_flight - running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "utilisation": min(1.0, self._busy_seconds / (uptime * self.max_workers)),
+                "average_wait_ms": 1000.0 * self._wait_seconds / finished if finished else 0.0,
+                "average_run_ms": 1000.0 * self._busy_seconds / finished if finished else 0.0
+            }
+
+
+def create_inference_executor(initializer: Optional[Callable] = None, initargs: Tuple = ()) -> InstrumentedExecutor:
+    """CPU-bound model executor: INFERENCE_EXECUTOR ("thread" or "process") with INFERENCE_WORKERS workers.
+
+    ``initializer`` only runs for process pools, where it loads the model
+    into each worker process.
+    """
+    kind = os.getenv("INFERENCE_EXECUTOR", "thread")
+    workers = int(os.getenv("INFERENCE_WORKERS", "1"))
+    logger.info(f"Inference executor: {workers} {kind} worker(s)")
+    if kind != "process":
+        initializer, initargs = None, ()
+    return InstrumentedExecutor("inference", kind=kind, max_workers=workers, initializer=initializer, initargs=initargs)
+
+
+def create_io_executor() -> InstrumentedExecutor:
+    """Thread pool for blocking database and vector-store calls, sized by IO_WORKERS."""
+    return InstrumentedExecutor("io", kind="thread", max_workers=int(os.getenv("IO_WORKERS", "8")))
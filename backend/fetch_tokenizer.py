@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Install the BPE file of the tokenizer encoding used for token budgets.
+
+Run once at build/setup time, after ``pip install -r requirements.txt``
+(setup.bat and start_demo.py do this). The file is downloaded into
+``tokenizers/`` (or TOKENIZER_DIR), checked against its known SHA-256 and
+then read from disk by context_packer.Tokenizer; the services themselves
+never download it.
+
+    python fetch_tokenizer.py [--encoding cl100k_base] [--force]
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import urllib.request
+
+from context_packer import ENCODINGS, TOKENIZER_DIR
+
+
+def fetch_encoding(encoding_name: str, bpe_dir: str, force: bool = False) -> str:
+    """Path of ``<encoding_name>.tiktoken`` in ``bpe_dir``, downloading and verifying it unless present."""
+    params = ENCODINGS[encoding_name]
+    path = os.path.join(bpe_dir, f"{encoding_name}.tiktoken")
+    if os.path.exists(path) and not force:
+        with open(path, "rb") as f:
+            if hashlib.sha256(f.read()).hexdigest() == params["sha256"]:
+                return path
+        print(f"⚠️ {path} does not match the expected checksum; downloading it again")
+
+    print(f"📦 Downloading {params['url']}")
+    with urllib.request.urlopen(params["url"], timeout=60) as response:
+        data = response.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest != params["sha256"]:
+        raise ValueError(f"Checksum mismatch for {encoding_name}: expected {params['sha256']}, got {digest}")
+
+    # Write to a temporary file first so a failed download never leaves a partial file behind
+    os.makedirs(bpe_dir, exist_ok=True)
+    partial = f"{path}.partial"
+    with open(partial, "wb") as f:
+        f.write(data)
+    os.replace(partial, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encoding", default=os.getenv("TOKENIZER_ENCODING", "cl100k_base"), choices=sorted(ENCODINGS))
+    parser.add_argument("--dir", default=os.getenv("TOKENIZER_DIR") or TOKENIZER_DIR)
+    parser.add_argument("--force", action="store_true", help="download even if a valid file is present")
+    args = parser.parse_args()
+
+    try:
+        path = fetch_encoding(args.encoding, args.dir, args.force)
+    except Exception as e:
+        print(f"❌ Failed to install the {args.encoding} tokenizer: {e}")
+        sys.exit(1)
+    print(f"✅ {args.encoding} tokenizer installed at {path}")
+
+
+if __name__ == "__main__":
+    main()
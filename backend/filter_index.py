@@ -0,0 +1,131 @@
+import logging
+import re
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# List-valued fields indexed by the words of their phrases
+TERM_FIELDS = ("ingredients", "allergens")
+
+# Predicate name -> (field, kind)
+PREDICATES = {
+    "categories": ("category", "any_of"),
+    "min_sweetness": ("sweetness", "min"),
+    "max_sweetness": ("sweetness", "max"),
+    "min_price": ("price", "min"),
+    "max_price": ("price", "max"),
+    "include_ingredients": ("ingredients", "include"),
+    "exclude_ingredients": ("ingredients", "exclude"),
+    "include_allergens": ("allergens", "include"),
+    "exclude_allergens": ("allergens", "exclude")
+}
+
+
+def _terms(phrase: str) -> Set[str]:
+    """Lowercase words of ``phrase`` with a plural "s" dropped, so "nuts" matches "nut"."""
+    words = _WORD_PATTERN.findall(phrase.lower())
+    return {word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word for word in words}
+
+
+class FilterIndex:
+    """Columnar index over the structured fields of a catalog.
+
+    Numeric fields are kept as column arrays and compared in one vectorized
+    pass; categories are integer-coded (English and Finnish names share a
+    code); ingredient and allergen phrases are indexed word by word into
+    posting lists of rows. ``mask(filters)`` combines the predicates into a
+    boolean bitmap over rows, so retrieval only scores rows that pass.
+
+    A phrase predicate matches a row when one of its phrases contains every
+    word of the predicate: excluding "nuts" drops "may contain traces of nuts".
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        # One pass, so ``records`` can be streamed from a store without being held in memory
+        self.ids = []
+        sweetness, price, category = [], [], []
+        self.category_codes: Dict[str, int] = {}
+        rows_by_term: Dict[str, Dict[str, List[int]]] = {field: {} for field in TERM_FIELDS}
+        for row, record in enumerate(records):
+            self.ids.append(record["id"])
+            sweetness.append(record.get("sweetness", np.nan))
+            price.append(record.get("price", np.nan))
+            code = self.category_codes.setdefault(str(record.get("category", "")).lower(), len(self.category_codes))
+            if record.get("category_fi"):
+                self.category_codes.setdefault(str(record["category_fi"]).lower(), code)
+            category.append(code)
+            for field in TERM_FIELDS:
+                for term in set().union(*(_terms(phrase) for phrase in record.get(field) or [])):
+                    rows_by_term[field].setdefault(term, []).append(row)
+
+        self.size = len(self.ids)
+        self.sweetness = np.array(sweetness, dtype=np.float32)
+        self.price = np.array(price, dtype=np.float32)
+        self.category = np.array(category, dtype=np.int32)
+        self.postings: Dict[str, Dict[str, np.ndarray]] = {
+            field: {term: np.asarray(rows, dtype=np.int32) for term, rows in terms.items()}
+            for field, terms in rows_by_term.items()
+        }
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _bitmap(self, rows: np.ndarray) -> np.ndarray:
+        bitmap = np.zeros(self.size, dtype=bool)
+        bitmap[rows] = True
+        return bitmap
+
+    def _phrase_bitmap(self, field: str, phrase: str) -> np.ndarray:
+        """Rows where ``field`` has every word of ``phrase``."""
+        bitmap = np.ones(self.size, dtype=bool)
+        for term in _terms(phrase):
+            rows = self.postings[field].get(term)
+            if rows is None:
+                return np.zeros(self.size, dtype=bool)
+            bitmap &= self._bitmap(rows)
+        return bitmap
+
+    def mask(self, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Boolean bitmap of the rows that satisfy every predicate in ``filters``."""
+        mask = np.ones(self.size, dtype=bool)
+        for name, value in (filters or {}).items():
+            if name not in PREDICATES:
+                raise ValueError(f"Unknown filter {name!r}; expected one of {', '.join(PREDICATES)}")
+            if value is None or (isinstance(value, (list, tuple)) and not value):
+                continue
+            field, kind = PREDICATES[name]
+            if kind == "any_of":
+                values = [value] if isinstance(value, str) else value
+                codes = [self.category_codes[v.lower()] for v in values if v.lower() in self.category_codes]
+                mask &= np.isin(self.category, codes)
+            elif kind in ("min", "max"):
+                column = getattr(self, field)
+                mask &= column >= float(value) if kind == "min" else column <= float(value)
+            else:
+                phrases = [value] if isinstance(value, str) else value
+                for phrase in phrases:
+                    matches = self._phrase_bitmap(field, phrase)
+                    mask &= matches if kind == "include" else ~matches
+        return mask
+
+    def matching_ids(self, filters: Optional[Dict[str, Any]]) -> List[Hashable]:
+        """Ids of the records that satisfy ``filters``, in catalog order."""
+        return [self.ids[row] for row in np.flatnonzero(self.mask(filters))]
+
+    def matching_rows(self, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Row positions of the records that satisfy ``filters``."""
+        return np.flatnonzero(self.mask(filters))
+
+
+def active_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """``filters`` without empty predicates, or ``None`` when nothing is left to filter on."""
+    active = {
+        name: value for name, value in (filters or {}).items()
+        if value is not None and not (isinstance(value, (list, tuple)) and not value)
+    }
+    return active or None
+
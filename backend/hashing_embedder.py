@@ -0,0 +1,78 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=65536)
+def _hash_feature(feature: str, dimensions: int) -> Tuple[int, float]:
+    """Stable (bucket, sign) for a feature; identical in every process, unlike ``hash()``."""
+    value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return value % dimensions, (1.0 if (value >> 63) & 1 else -1.0)
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing text embedder.
+
+    Word unigrams, word bigrams and character n-grams of each word are hashed
+    into a fixed number of signed buckets and the result is L2-normalized.
+    Character n-grams make inflected forms (common in Finnish) land close to
+    each other. No model, network or random state is involved, so the same
+    text maps to the same vector in every worker and across restarts.
+    """
+
+    def __init__(self, dimensions: int = 384, char_ngram: int = 3, char_weight: float = 0.5):
+        self.dimensions = dimensions
+        self.char_ngram = char_ngram
+        self.char_weight = char_weight
+
+    def _features(self, text: str) -> Tuple[List[str], List[float]]:
+        words = _TOKEN_PATTERN.findall(text.lower())
+        features = [f"w:{word}" for word in words]
+        weights = [1.0] * len(words)
+
+        features.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+        weights.extend([0.5] * (len(words) - 1 if words else 0))
+
+        n = self.char_ngram
+        for word in words:
+            padded = f"<{word}>"
+            grams = [padded[i:i + n] for i in range(max(1, len(padded) - n + 1))]
+            features.extend(f"c:{gram}" for gram in grams)
+            weights.extend([self.char_weight / len(grams)] * len(grams))
+
+        return features, weights
+
+    def _hashed(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Flattened (row, bucket, signed weight) triples for every feature of every text."""
+        rows, buckets, values = [], [], []
+        for row, text in enumerate(texts):
+            features, weights = self._features(text)
+            for feature, weight in zip(features, weights):
+                bucket, sign = _hash_feature(feature, self.dimensions)
+                rows.append(row)
+                buckets.append(bucket)
+                values.append(sign * weight)
+        return (
+            np.asarray(rows, dtype=np.int64),
+            np.asarray(buckets, dtype=np.int64),
+            np.asarray(values, dtype=np.float32)
+        )
+
+    def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed a batch of texts into an ``(len(texts), dimensions)`` float32 matrix."""
+        rows, buckets, values = self._hashed(texts)
+        flat = np.bincount(rows * self.dimensions + buckets, weights=values, minlength=len(texts) * self.dimensions)
+        matrix = flat.reshape(len(texts), self.dimensions).astype(np.float32)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a single text into a ``dimensions``-long float32 vector."""
+        return self.embed_many([text])[0]
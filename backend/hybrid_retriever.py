@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+# A ranked list of (document id, raw score) pairs, best first
+Ranking = List[Tuple[Hashable, float]]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Ranking], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked lists with RRF: ``score(d) = sum(1 / (k + rank_i(d)))``, best first."""
+    fused = {}
+    for ranking in rankings:
+        for rank, (doc_id, _) in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """Run a dense and a lexical retriever concurrently and merge them with RRF.
+
+    Both retrievers are plain blocking callables returning a ``Ranking``; they
+    are dispatched to ``executor`` (the loop's default executor when ``None``)
+    so neither blocks the event loop while the other runs. ``dense_search_batch``
+    optionally ranks many query embeddings in one call for ``retrieve_batch``.
+    """
+
+    def __init__(
+        self,
+        dense_search: Callable[[Any, int], Ranking],
+        lexical_search: Callable[[str, int], Ranking],
+        candidate_pool: int = 20,
+        rrf_k: int = 60,
+        executor=None,
+        dense_search_batch: Optional[Callable[[Sequence[Any], int], List[Ranking]]] = None
+    ):
+        self.dense_search = dense_search
+        self.dense_search_batch = dense_search_batch
+        self.lexical_search = lexical_search
+        self.candidate_pool = candidate_pool
+        self.rrf_k = rrf_k
+        self.executor = executor
+
+    async def retrieve(self, query_text: str, query_embedding: Any, top_k: int, candidate_pool: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the fused top-k with per-retriever ranks and scores for explanation."""
+        pool = max(top_k, candidate_pool or self.candidate_pool)
+        loop = asyncio.get_running_loop()
+        dense, lexical = await asyncio.gather(
+            loop.run_in_executor(self.executor, self.dense_search, query_embedding, pool),
+            loop.run_in_executor(self.executor, self.lexical_search, query_text, pool)
+        )
+        return self._fuse(dense, lexical, top_k)
+
+    async def retrieve_batch(self, query_texts: Sequence[str], query_embeddings: Sequence[Any], top_k: int, candidate_pool: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """``retrieve()`` for many queries, with one batched dense lookup when available."""
+        pool = max(top_k, candidate_pool or self.candidate_pool)
+        loop = asyncio.get_running_loop()
+        if self.dense_search_batch is not None:
+            dense_call = loop.run_in_executor(self.executor, self.dense_search_batch, query_embeddings, pool)
+        else:
+            dense_call = loop.run_in_executor(
+                self.executor, lambda: [self.dense_search(embedding, pool) for embedding in query_embeddings]
+            )
+        lexical_call = loop.run_in_executor(
+            self.executor, lambda: [self.lexical_search(text, pool) for text in query_texts]
+        )
+        dense, lexical = await asyncio.gather(dense_call, lexical_call)
+        return [self._fuse(dense_ranking, lexical_ranking, top_k) for dense_ranking, lexical_ranking in zip(dense, lexical)]
+
+    def _fuse(self, dense: Ranking, lexical: Ranking, top_k: int) -> List[Dict[str, Any]]:
+        """Fused top-k with per-retriever ranks and scores for explanation."""
+        dense_positions = {doc_id: (rank, score) for rank, (doc_id, score) in enumerate(dense, start=1)}
+        lexical_positions = {doc_id: (rank, score) for rank, (doc_id, score) in enumerate(lexical, start=1)}
+
+        results = []
+        for doc_id, fusion_score in reciprocal_rank_fusion([dense, lexical], k=self.rrf_k)[:top_k]:
+            dense_rank, dense_score = dense_positions.get(doc_id, (None, None))
+            lexical_rank, lexical_score = lexical_positions.get(doc_id, (None, None))
+            results.append({
+                "id": doc_id,
+                "fusion_score": fusion_score,
+                "dense_rank": dense_rank,
+                "dense_score": dense_score,
+                "lexical_rank": lexical_rank,
+                "lexical_score": lexical_score
+            })
+        return results
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item calls into one batched call.
+
+    ``submit()`` queues an item and waits for its result. A background task
+    flushes the queue once ``max_batch_size`` items are waiting or the oldest
+    one has waited ``max_wait_ms``, runs ``batch_fn`` on the batch in
+    ``executor`` (the loop's default executor when ``None``) and hands each
+    caller its own result. Only one batch runs at a time; items arriving
+    meanwhile form the next batch, so batches grow with load while a lone
+    request waits at most ``max_wait_ms`` extra.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor=None
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._full: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue ``item`` for the next batch and return its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.monotonic()))
+        if self._worker is None or self._worker.done():
+            self._full = asyncio.Event()
+            self._worker = loop.create_task(self._drain())
+        elif len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            # Wait for a full batch, but never past the oldest item's deadline
+            remaining = self.max_wait - (time.monotonic() - self._pending[0][2])
+            if len(self._pending) < self.max_batch_size and remaining > 0:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, [item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} items failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                # A caller that was cancelled no longer wants its result
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": self.items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": len(self._pending)
+        }
+
+
+def create_embedding_batcher(batch_fn: Callable[[List[Any]], Sequence[Any]], executor=None) -> MicroBatcher:
+    """Micro-batcher sized by EMBEDDING_MAX_BATCH_SIZE and EMBEDDING_MAX_WAIT_MS."""
+    return MicroBatcher(
+        batch_fn,
+        max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32")),
+        max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5")),
+        executor=executor
+    )
@@ -0,0 +1,132 @@
+import logging
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+# Inputs a BERT-style encoder graph may declare
+_MODEL_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def _hub_name(model_name: str) -> str:
+    """Sentence-transformers short names live under the sentence-transformers organisation."""
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def export_onnx(model_name: str, model_dir: str, opset: int = 14) -> str:
+    """Export the transformer encoder of ``model_name`` to ``model_dir/model.onnx``.
+
+    Only needed once per model; the tokenizer is saved next to the graph so
+    serving needs neither PyTorch nor network access afterwards.
+    """
+    import torch
+    from transformers import AutoModel
+
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+    model = AutoModel.from_pretrained(_hub_name(model_name)).eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in _MODEL_INPUTS if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+
+    path = os.path.join(model_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    tokenizer.save_pretrained(model_dir)
+    logger.info(f"Exported {model_name} to {path}")
+    return path
+
+
+def quantize_onnx(path: str, quantized_path: str) -> str:
+    """Dynamic int8 quantization of the graph's weights (activations stay float)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"Quantized {path} to {quantized_path}")
+    return quantized_path
+
+
+class OnnxEmbedder:
+    """Sentence-transformer inference through ONNX Runtime on CPU.
+
+    Reproduces the ``all-MiniLM-L6-v2`` pipeline (transformer, mean pooling,
+    L2 normalization), so vectors are interchangeable with
+    ``SentenceTransformer.encode`` output and the existing index. The graph
+    is exported on first use into ``model_dir`` and, with ``quantize``, a
+    dynamically int8-quantized copy is made next to it.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        model_dir: Optional[str] = None,
+        quantize: bool = False,
+        max_length: int = 256,
+        threads: int = 0
+    ):
+        self.model_name = model_name
+        self.model_dir = model_dir or os.path.join(os.getenv("ONNX_MODEL_DIR", "./onnx_models"), model_name)
+        self.quantize = quantize
+        self.max_length = max_length
+
+        path = os.path.join(self.model_dir, "model.onnx")
+        if not os.path.exists(path):
+            export_onnx(model_name, self.model_dir)
+        if quantize:
+            quantized_path = os.path.join(self.model_dir, "model.int8.onnx")
+            if not os.path.exists(quantized_path):
+                quantize_onnx(path, quantized_path)
+            path = quantized_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        self.dimensions = self.session.get_outputs()[0].shape[-1]
+        logger.info(f"Loaded ONNX embedder {path} ({'int8' if quantize else 'fp32'})")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimensions
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        if "token_type_ids" in self.input_names and "token_type_ids" not in feeds:
+            feeds["token_type_ids"] = np.zeros_like(feeds["input_ids"])
+        hidden = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real (non-padding) tokens
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, sentences: Sequence[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Embed ``sentences`` into an ``(n, dimensions)`` float32 matrix, like ``SentenceTransformer.encode``."""
+        if isinstance(sentences, str):
+            return self._encode_batch([sentences])[0]
+        texts = list(sentences)
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        # Sorting by length keeps padding (wasted compute) low within each batch
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch([texts[row] for row in rows])
+        return embeddings
+
@@ -0,0 +1,61 @@
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI
+
+# One pooled client per process, shared by every service that talks to OpenAI
+_async_client: Optional["AsyncOpenAI"] = None
+
+
+def _pool_limits() -> "httpx.Limits":
+    """Connection pool limits, tunable through environment variables."""
+    import httpx
+
+    return httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+    )
+
+
+def get_async_client(api_key: Optional[str] = None) -> "AsyncOpenAI":
+    """Return the process-wide non-blocking OpenAI client, creating it on first use.
+
+    The openai package is imported here rather than at module import, so
+    services that never call OpenAI don't pay for it at startup.
+    """
+    global _async_client
+    if _async_client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(
+            limits=_pool_limits(),
+            timeout=httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "30")), connect=5.0)
+        )
+        _async_client = AsyncOpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            http_client=http_client,
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+        )
+    return _async_client
+
+
+def _forget_client():
+    """Drop a client inherited across fork; its sockets belong to the parent."""
+    global _async_client
+    _async_client = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_client)
+
+
+async def close_async_client():
+    """Close the shared client and release its pooled connections."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
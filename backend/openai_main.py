@@ -1,11 +1,14 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any
 import asyncio
+import os
 import logging
 
 from openai_rag_service import OpenAIRAGService
+from sse import sse_response
+from warmup import Warmup
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,16 +29,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize RAG service
-try:
-    rag_service = OpenAIRAGService()
-    logger.info("OpenAI RAG Service initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize OpenAI RAG Service: {e}")
-    # Fallback to simple service if OpenAI fails
-    from simple_rag_service import SimpleRAGService
-    rag_service = SimpleRAGService()
-    logger.info("Fallback to Simple RAG Service")
+# Upper bound on queries accepted by /query/batch
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "10000"))
+
+# RAG service, created by the background warm-up (or preloaded by serve.py)
+rag_service = None
+warmup = Warmup("RAG service")
+
+def create_rag_service():
+    """Build the OpenAI RAG service, falling back to the simple service if OpenAI is unavailable."""
+    try:
+        service = OpenAIRAGService()
+        logger.info("OpenAI RAG Service initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize OpenAI RAG Service: {e}")
+        # Fallback to simple service if OpenAI fails
+        from simple_rag_service import SimpleRAGService
+        service = SimpleRAGService()
+        logger.info("Fallback to Simple RAG Service")
+    return service
+
+async def warm_up():
+    """Create the RAG service if needed, then precompute embeddings and build its index."""
+    global rag_service
+    if rag_service is None:
+        rag_service = create_rag_service()
+    warmup.timer = rag_service.startup_timer
+    await rag_service.initialize()
+
+@app.on_event("startup")
+async def startup_event():
+    """Start warming up the RAG service in the background so the server binds immediately"""
+    warmup.start(warm_up)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled connections held by the RAG service"""
+    await warmup.stop()
+    if hasattr(rag_service, 'close'):
+        await rag_service.close()
 
 # Request/Response models
 class QueryRequest(BaseModel):
@@ -49,6 +81,17 @@ class QueryResponse(BaseModel):
     final_answer: Dict[str, str]
     total_time: float
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    language: str = "en"
+    top_k: int = Field(3, ge=1)
+    generate: bool = True
+
+class BatchQueryResponse(BaseModel):
+    language: str
+    results: List[Dict[str, Any]]
+    total_time: float
+
 class CandyResponse(BaseModel):
     candies: List[Dict[str, Any]]
 
@@ -65,7 +108,10 @@ async def root():
         "description": "Interactive RAG pipeline demonstration with OpenAI integration",
         "endpoints": [
             "/query - Process RAG queries with step-by-step breakdown",
+            "/query/stream - Stream pipeline steps and answer tokens as server-sent events",
+            "/query/batch - Answer many queries in one request",
             "/candies - Get all available candies in the demo",
+            "/ready - Readiness probe (503 until the RAG service has warmed up)",
             "/reset - Reset the demo state"
         ],
         "features": [
@@ -77,7 +123,7 @@ async def root():
         ]
     }
 
-@app.post("/query", response_model=QueryResponse)
+@app.post("/query", response_model=QueryResponse, dependencies=[Depends(warmup.require_ready)])
 async def process_query(request: QueryRequest):
     """
     Process a user query through the RAG pipeline.
@@ -104,7 +150,55 @@ async def process_query(request: QueryRequest):
         logger.error(f"Error processing query: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
-@app.get("/candies", response_model=CandyResponse)
+@app.post("/query/stream", dependencies=[Depends(warmup.require_ready)])
+async def stream_query(request: QueryRequest):
+    """
+    Stream a user query through the RAG pipeline as server-sent events.
+    
+    Event types:
+    - step: a pipeline step, sent as soon as that stage finishes
+    - token: a chunk of the generated answer, sent as it arrives from the model
+    - result: the complete response, identical to the /query payload
+    - error: processing failed after the stream started
+    """
+    logger.info(f"Streaming query: '{request.query}' in language: {request.language}")
+    return sse_response(rag_service.stream_query_with_steps(
+        query=request.query,
+        language=request.language
+    ))
+
+@app.post("/query/batch", response_model=BatchQueryResponse, dependencies=[Depends(warmup.require_ready)])
+async def process_batch(request: BatchQueryRequest):
+    """
+    Answer many queries in one request, for offline evaluation jobs.
+    
+    All queries are embedded with multi-input embedding requests and searched
+    with one batched vector lookup. Answers are generated concurrently with
+    at most BATCH_CONCURRENCY requests in flight; set generate=false to get
+    retrieval results only.
+    """
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    try:
+        logger.info(f"Processing batch of {len(request.queries)} queries in language: {request.language}")
+        start_time = asyncio.get_event_loop().time()
+        
+        results = await rag_service.process_batch(
+            queries=request.queries,
+            language=request.language,
+            top_k=request.top_k,
+            generate=request.generate
+        )
+        
+        total_time = asyncio.get_event_loop().time() - start_time
+        logger.info(f"Batch processed successfully in {total_time:.2f}s")
+        return BatchQueryResponse(language=request.language, results=results, total_time=total_time)
+        
+    except Exception as e:
+        logger.error(f"Error processing query batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Error processing query batch: {str(e)}")
+
+@app.get("/candies", response_model=CandyResponse, dependencies=[Depends(warmup.require_ready)])
 async def get_candies():
     """
     Get all available candies in the demo database.
@@ -123,7 +217,7 @@ async def get_candies():
         logger.error(f"Error retrieving candies: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving candies: {str(e)}")
 
-@app.post("/reset", response_model=ResetResponse)
+@app.post("/reset", response_model=ResetResponse, dependencies=[Depends(warmup.require_ready)])
 async def reset_demo():
     """
     Reset the demo state.
@@ -139,9 +233,14 @@ async def reset_demo():
         logger.error(f"Error resetting demo: {e}")
         raise HTTPException(status_code=500, detail=f"Error resetting demo: {str(e)}")
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the RAG service has warmed up, with per-component startup times."""
+    return warmup.response()
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
+    """Liveness check endpoint; answers while the RAG service is still warming up."""
     return {
         "status": "healthy",
         "service": "AI Candy Store RAG Demo",
@@ -151,4 +250,6 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info") 
\ No newline at end of file
+    # Set SHARED_INDEX_DIR as well so workers share one memory-mapped index
+    uvicorn.run("openai_main:app", host="0.0.0.0", port=8000, log_level="info",
+                workers=int(os.getenv("WEB_CONCURRENCY", "1"))) 
\ No newline at end of file
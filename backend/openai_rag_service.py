@@ -1,13 +1,23 @@
 import os
 import time
 import json
+import hashlib
 import asyncio
 import numpy as np
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from dotenv import load_dotenv
 import logging
 
+from answer_cache import create_answer_cache
+from context_packer import create_context_packer
+from embedding_store import EmbeddingStore
+from openai_client import get_async_client, close_async_client
+from query_cache import create_query_embedding_cache, normalize_query
+from response_cache import create_response_cache
+from shared_index import create_shared_index_store
+from vector_index import VectorIndex, create_index
+from warmup import StartupTimer
+
 # Load environment variables
 load_dotenv()
 
@@ -22,11 +32,24 @@ class OpenAIRAGService:
         if not self.api_key:
             raise ValueError("OpenAI API key not found in environment variables")
         
-        self.client = OpenAI(api_key=self.api_key)
+        # Created in initialize() so constructing the service stays cheap
+        self.client = None
+        self.embedding_model = "text-embedding-3-small"
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "8"))
+        self.embedding_store = EmbeddingStore()
+        self.query_cache = create_query_embedding_cache()
+        self.answer_cache = create_answer_cache()
+        self.context_packer = create_context_packer()
+        self.response_cache = create_response_cache()
+        self.shared_index = create_shared_index_store()
         
-        # Load candy data
+        # Load candy data; embeddings are computed in initialize(). Index ids
+        # are row numbers into self.candies.
         self.candies = self._load_candy_data()
-        self.candy_embeddings = self._precompute_embeddings()
+        self.vector_index = self._create_vector_index()
+        self._index_ready = False
+        self.startup_timer = StartupTimer("OpenAIRAGService")
         
         # Translations for UI
         self.translations = {
@@ -52,6 +75,72 @@ class OpenAIRAGService:
             }
         }
 
+    async def initialize(self):
+        """Precompute catalog embeddings and build the vector index.
+
+        With SHARED_INDEX_DIR set, the index and catalog are memory-mapped
+        from a snapshot shared by every worker on the host; only the first
+        worker to start after a catalog change builds and publishes it.
+        """
+        # A client inherited from a preloading parent is dropped at fork
+        self.client = get_async_client(self.api_key)
+        if not self._index_ready:
+            await self._load_index()
+        self.answer_cache.set_catalog_version(self._catalog_version())
+        with self.startup_timer.measure("tokenizer"):
+            await asyncio.get_running_loop().run_in_executor(None, self.context_packer.tokenizer.load)
+        logger.info(f"OpenAI RAG service initialized successfully ({self.startup_timer.summary()})")
+
+    def preload(self):
+        """Build the vector index in the parent process before workers fork (see serve.py)."""
+        async def build():
+            self.client = get_async_client(self.api_key)
+            try:
+                await self._load_index()
+            finally:
+                # Pooled connections are bound to this temporary event loop
+                await close_async_client()
+
+        asyncio.run(build())
+        logger.info("OpenAI RAG service preloaded")
+
+    async def _load_index(self):
+        if self.shared_index is None:
+            with self.startup_timer.measure("catalog_embeddings"):
+                embeddings, _ = await self._precompute_embeddings()
+            with self.startup_timer.measure("vector_index"):
+                self.vector_index = self._build_vector_index(embeddings)
+        else:
+            with self.startup_timer.measure("shared_index"):
+                await self._open_shared_index(self._catalog_version())
+        self._index_ready = True
+
+    async def _open_shared_index(self, version: str):
+        """Map the shared snapshot for ``version``, building and publishing it if missing."""
+        key = self._shared_index_key(version)
+        shared = self.shared_index.open(key)
+        if shared is None:
+            with self.shared_index.build_lock():
+                # Another worker may have published while we waited for the lock
+                shared = self.shared_index.open(key)
+                if shared is None:
+                    embeddings, fallback_rows = await self._precompute_embeddings()
+                    index = self._build_vector_index(embeddings)
+                    if fallback_rows:
+                        # Never share random placeholder vectors with other workers
+                        logger.warning(f"Not publishing shared index: {fallback_rows} candies lack real embeddings")
+                        self.vector_index = index
+                        return
+                    shared = self.shared_index.publish(key, index, self.candies)
+        self.vector_index, self.candies = shared
+        logger.info(f"Mapped shared index with {len(self.candies)} candies from {self.shared_index.directory}")
+
+    async def close(self):
+        """Release pooled HTTP connections and the SQLite caches."""
+        await close_async_client()
+        self.embedding_store.close()
+        self.response_cache.close()
+
     def _load_candy_data(self) -> List[Dict[str, Any]]:
         """Load the comprehensive candy dataset."""
         return [
@@ -117,89 +206,161 @@ class OpenAIRAGService:
             }
         ]
 
-    def _precompute_embeddings(self) -> Dict[int, List[float]]:
-        """Precompute embeddings for all candies using OpenAI's text-embedding-3-small model."""
-        embeddings = {}
-        
-        for candy in self.candies:
-            # Create a comprehensive text representation
-            text = f"{candy['name']} {candy['category']} {candy['description']} {' '.join(candy['flavors'])} {candy['texture']} sweetness level {candy['sweetness']}"
-            
+    def _candy_embedding_text(self, candy: Dict[str, Any]) -> str:
+        """Build the comprehensive text representation that gets embedded for a candy."""
+        return f"{candy['name']} {candy['category']} {candy['description']} {' '.join(candy['flavors'])} {candy['texture']} sweetness level {candy['sweetness']}"
+
+    async def _precompute_embeddings(self) -> Tuple[np.ndarray, int]:
+        """Precompute embeddings for all candies using OpenAI's text-embedding-3-small model.
+
+        Vectors are served from the persistent embedding store when the exact
+        text was embedded before; only new or changed candies are sent to the
+        API, in batched multi-input requests. Returns a float32 matrix whose
+        rows follow ``self.candies`` and how many rows fell back to random
+        vectors.
+        """
+        texts = {candy['id']: self._candy_embedding_text(candy) for candy in self.candies}
+        cached = self.embedding_store.get_many(self.embedding_model, texts.values())
+        missing = [text for text in dict.fromkeys(texts.values()) if text not in cached]
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+
+        for start in range(0, len(missing), self.embedding_batch_size):
+            batch = missing[start:start + self.embedding_batch_size]
             try:
-                response = self.client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=text
+                response = await self.client.embeddings.create(
+                    model=self.embedding_model,
+                    input=batch
                 )
-                embeddings[candy['id']] = response.data[0].embedding
-                logger.info(f"Generated embedding for {candy['name']}")
+                vectors = {batch[item.index]: item.embedding for item in response.data}
+                self.embedding_store.put_many(self.embedding_model, vectors)
+                cached.update({text: np.asarray(vector, dtype=np.float32) for text, vector in vectors.items()})
+                logger.info(f"Generated {len(vectors)} candy embeddings in one request")
             except Exception as e:
-                logger.error(f"Failed to generate embedding for {candy['name']}: {e}")
-                # Fallback to random embedding for demo purposes
-                embeddings[candy['id']] = np.random.normal(0, 1, 1536).tolist()
+                logger.error(f"Failed to generate embeddings for a batch of {len(batch)} candies: {e}")
+
+        embeddings = np.empty((len(self.candies), 1536), dtype=np.float32)
+        fallback_rows = 0
+        for row, candy in enumerate(self.candies):
+            vector = cached.get(texts[candy['id']])
+            if vector is None:
+                # Fallback to random embedding for demo purposes (never persisted)
+                vector = np.random.normal(0, 1, 1536)
+                fallback_rows += 1
+            embeddings[row] = vector
         
-        return embeddings
+        return embeddings, fallback_rows
+
+    async def _generate_query_embedding(self, query: str, language: str) -> Tuple[List[float], bool]:
+        """Generate embedding for the user query using OpenAI.
+
+        Returns the embedding and whether it was served from the query cache.
+        """
+        cache_key = (normalize_query(query), self.embedding_model, language)
+        embedding = self.query_cache.get(cache_key)
+        if embedding is not None:
+            return embedding, True
 
-    def _generate_query_embedding(self, query: str) -> List[float]:
-        """Generate embedding for the user query using OpenAI."""
         try:
-            response = self.client.embeddings.create(
-                model="text-embedding-3-small",
+            response = await self.client.embeddings.create(
+                model=self.embedding_model,
                 input=query
             )
-            return response.data[0].embedding
+            embedding = response.data[0].embedding
+            self.query_cache.set(cache_key, embedding)
+            return embedding, False
         except Exception as e:
             logger.error(f"Failed to generate query embedding: {e}")
-            # Fallback to random embedding
-            return np.random.normal(0, 1, 1536).tolist()
+            # Fallback to random embedding (not cached)
+            return np.random.normal(0, 1, 1536).tolist(), False
 
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors."""
-        vec1_np = np.array(vec1)
-        vec2_np = np.array(vec2)
-        
-        dot_product = np.dot(vec1_np, vec2_np)
-        norm1 = np.linalg.norm(vec1_np)
-        norm2 = np.linalg.norm(vec2_np)
-        
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        
-        return dot_product / (norm1 * norm2)
+    async def _generate_query_embeddings(self, queries: List[str], language: str) -> Tuple[np.ndarray, int]:
+        """Embed many queries, sending all cache misses as multi-input requests.
+
+        Returns one float32 row per query and how many came from the query cache.
+        """
+        keys = [(normalize_query(query), self.embedding_model, language) for query in queries]
+        first_query = {}
+        for key, query in zip(keys, queries):
+            first_query.setdefault(key, query)
+        embeddings = {key: self.query_cache.get(key) for key in first_query}
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+
+        for start in range(0, len(missing), self.embedding_batch_size):
+            batch = missing[start:start + self.embedding_batch_size]
+            try:
+                response = await self.client.embeddings.create(
+                    model=self.embedding_model,
+                    input=[first_query[key] for key in batch]
+                )
+                for item in response.data:
+                    embeddings[batch[item.index]] = item.embedding
+                    self.query_cache.set(batch[item.index], item.embedding)
+            except Exception as e:
+                logger.error(f"Failed to generate embeddings for a batch of {len(batch)} queries: {e}")
+                # Fallback to random embeddings (not cached)
+                for key in batch:
+                    embeddings[key] = np.random.normal(0, 1, 1536).tolist()
+
+        missing_keys = set(missing)
+        cache_hits = sum(1 for key in keys if key not in missing_keys)
+        return np.asarray([embeddings[key] for key in keys], dtype=np.float32), cache_hits
+
+    def _catalog_version(self) -> str:
+        """Fingerprint of the embedded catalog; any edit produces a new version."""
+        digest = hashlib.sha256(self.embedding_model.encode("utf-8"))
+        for candy in self.candies:
+            digest.update(json.dumps(candy, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _shared_index_key(self, version: str) -> str:
+        """Snapshot key: catalog version plus the index type, so changing VECTOR_INDEX rebuilds."""
+        layout = json.dumps({"kind": self.vector_index.kind, "params": self.vector_index.params()}, sort_keys=True)
+        return hashlib.sha256(f"{version}:{layout}".encode("utf-8")).hexdigest()[:32]
+
+    def _create_vector_index(self) -> VectorIndex:
+        """Empty vector index; int8 codes with full-precision re-ranking unless VECTOR_INDEX says otherwise."""
+        return create_index(dimensions=1536, kind=os.getenv("VECTOR_INDEX", "int8"))
+
+    def _build_vector_index(self, embeddings: np.ndarray) -> VectorIndex:
+        """Load candy embeddings (rows follow ``self.candies``) into a new vector index."""
+        index = self._create_vector_index()
+        if len(self.candies):
+            index.add(list(range(len(self.candies))), embeddings)
+        return index
 
     def _search_similar_candies(self, query_embedding: List[float], top_k: int = 3) -> List[Dict[str, Any]]:
         """Find the most similar candies based on embedding similarity."""
-        similarities = []
-        
-        for candy in self.candies:
-            candy_embedding = self.candy_embeddings[candy['id']]
-            similarity = self._cosine_similarity(query_embedding, candy_embedding)
-            
-            similarities.append({
-                'candy': candy,
+        if top_k <= 0:
+            return []
+
+        hits = self.vector_index.search(np.asarray(query_embedding, dtype=np.float32), top_k)
+        return self._context_candies(hits)
+
+    def _context_candies(self, hits: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        """Resolve vector index hits (catalog row, similarity) into ranked context items."""
+        return [
+            {
+                'candy': self.candies[row],
                 'similarity': similarity,
-                'rank': 0  # Will be set after sorting
-            })
-        
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        
-        # Add ranks
-        for i, item in enumerate(similarities[:top_k]):
-            item['rank'] = i + 1
-        
-        return similarities[:top_k]
+                'rank': rank
+            }
+            for rank, (row, similarity) in enumerate(hits, start=1)
+        ]
 
-    def _generate_ai_response(self, query: str, context_candies: List[Dict[str, Any]], language: str) -> str:
-        """Generate AI response using OpenAI based on the retrieved context."""
-        # Prepare context information
-        context_info = []
-        for item in context_candies:
-            candy = item['candy']
-            context_info.append(f"- {candy['name']}: {candy['description']} (Sweetness: {candy['sweetness']}/10)")
-        
-        context_text = "\n".join(context_info)
-        
-        # Create system prompt based on language
+    def _pack_context(self, context_candies: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fit the retrieved candies into the context token budget, most similar first."""
+        return self.context_packer.pack(
+            {
+                "key": item['candy']['id'],
+                "header": f"- {item['candy']['name']}: ",
+                "passages": [item['candy']['description']],
+                "footer": f" (Sweetness: {item['candy']['sweetness']}/10)"
+            }
+            for item in context_candies
+        )
+
+    def _build_messages(self, query: str, context_text: str, language: str) -> List[Dict[str, str]]:
+        """Chat messages sent to the model for ``query`` with ``context_text``."""
         if language == 'fi':
             system_prompt = """Olet ystävällinen makeiskaupan asiantuntija. Vastaa kysymyksiin makeisista ja herkkuista perustuen annettuun kontekstiin. 
             Pidä vastaus hauska, informatiivinen ja noin 2-3 virkettä pitkä. Käytä emojeja sopivasti."""
@@ -208,30 +369,133 @@ class OpenAIRAGService:
             system_prompt = """You are a friendly candy store expert. Answer questions about candies and sweets based on the provided context. 
             Keep the response fun, informative, and about 2-3 sentences long. Use emojis appropriately."""
             user_prompt = f"Context about candies:\n{context_text}\n\nQuestion: {query}"
-        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    async def _generate_ai_response(self, query: str, query_embedding: List[float], context_candies: List[Dict[str, Any]], context_text: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        """Generate AI response using OpenAI based on the retrieved context.
+
+        Yields ``{"token": ...}`` chunks as they arrive from the model, then a
+        single ``{"answer": ..., "cache": ..., "response_cache": ...}`` item
+        with the full answer. Near-duplicate questions that retrieved the same
+        candies are answered from the semantic answer cache, in which case
+        ``cache`` holds the matching entry; a byte-identical request made
+        earlier, possibly before a restart, is answered from the persistent
+        response cache, in which case ``response_cache`` holds the entry's age
+        and hit count. Both are ``None`` when the model was called.
+
+        If the model fails before streaming anything, a fallback answer
+        naming the retrieved candies is used; if the stream breaks part-way
+        the error is raised, since the client already has part of the real
+        answer.
+        """
+        context_ids = [item['candy']['id'] for item in context_candies]
+        cached = self.answer_cache.lookup(query_embedding, context_ids, language)
+        if cached is not None:
+            yield {"token": cached['answer']}
+            yield {"answer": cached['answer'], "cache": cached, "response_cache": None}
+            return
+
+        request = {
+            "model": "gpt-3.5-turbo",
+            "messages": self._build_messages(query, context_text, language),
+            "max_tokens": 150,
+            "temperature": self.response_cache.temperature(0.7)
+        }
+        loop = asyncio.get_running_loop()
+        # Blocking SQLite calls run in a worker thread, not on the event loop
+        cached_response = await loop.run_in_executor(None, self.response_cache.get, request)
+        if cached_response is not None:
+            answer = cached_response['response']
+            self.answer_cache.store(query, query_embedding, context_ids, language, answer)
+            yield {"token": answer}
+            yield {"answer": answer, "cache": None, "response_cache": cached_response}
+            return
+
+        streamed = []
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=150,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content.strip()
+            stream = await self.client.chat.completions.create(**request, stream=True)
+            async for chunk in stream:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    streamed.append(token)
+                    yield {"token": token}
         
         except Exception as e:
+            if streamed:
+                logger.error(f"OpenAI stream failed after {len(streamed)} tokens: {e}")
+                raise
             logger.error(f"OpenAI API error: {e}")
             # Fallback response
             if language == 'fi':
-                return f"Anteeksi, kohtasin teknisen ongelman. Löysin kuitenkin nämä herkut sinulle: {', '.join([item['candy']['name'] for item in context_candies[:2]])} 🍭"
+                answer = f"Anteeksi, kohtasin teknisen ongelman. Löysin kuitenkin nämä herkut sinulle: {', '.join([item['candy']['name'] for item in context_candies[:2]])} 🍭"
             else:
-                return f"Sorry, I encountered a technical issue. However, I found these treats for you: {', '.join([item['candy']['name'] for item in context_candies[:2]])} 🍭"
+                answer = f"Sorry, I encountered a technical issue. However, I found these treats for you: {', '.join([item['candy']['name'] for item in context_candies[:2]])} 🍭"
+            yield {"token": answer}
+            yield {"answer": answer, "cache": None, "response_cache": None}
+            return
+
+        answer = "".join(streamed).strip()
+        self.answer_cache.store(query, query_embedding, context_ids, language, answer)
+        await loop.run_in_executor(None, self.response_cache.put, request, answer)
+        yield {"answer": answer, "cache": None, "response_cache": None}
+
+    async def process_batch(self, queries: List[str], language: str = 'en', top_k: int = 3, generate: bool = True) -> List[Dict[str, Any]]:
+        """Answer many queries at once without per-step visualization.
+
+        Query embeddings are requested in multi-input batches and searched
+        with one batched index lookup; answers are generated concurrently,
+        at most ``batch_concurrency`` requests at a time. Results follow the
+        order of ``queries``.
+        """
+        if not queries:
+            return []
+        processed = [query.lower().strip() for query in queries]
+        embeddings, cache_hits = await self._generate_query_embeddings(processed, language)
+        hits = self.vector_index.search_batch(embeddings, top_k) if top_k > 0 else [[] for _ in queries]
+        logger.info(f"Batch of {len(queries)} queries: {cache_hits} embedding cache hits")
+
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+
+        async def answer(query: str, query_embedding: np.ndarray, context_candies: List[Dict[str, Any]]) -> Dict[str, Any]:
+            final_answer = None
+            if generate:
+                async with semaphore:
+                    context_text = self._pack_context(context_candies)["text"]
+                    async for chunk in self._generate_ai_response(query, query_embedding.tolist(), context_candies, context_text, language):
+                        if "answer" in chunk:
+                            final_answer = {"en": chunk["answer"], "fi": chunk["answer"]}
+            return {
+                "query": query,
+                "results": [
+                    {**item['candy'], 'similarity': item['similarity'], 'rank': item['rank']}
+                    for item in context_candies
+                ],
+                "final_answer": final_answer
+            }
+
+        return await asyncio.gather(*[
+            answer(query, embedding, self._context_candies(query_hits))
+            for query, embedding, query_hits in zip(queries, embeddings, hits)
+        ])
 
     async def process_query_with_steps(self, query: str, language: str = 'en') -> Dict[str, Any]:
         """Process a query through the complete RAG pipeline with detailed step information."""
+        result = None
+        async for event in self.stream_query_with_steps(query, language):
+            if event["event"] == "result":
+                result = event["data"]
+        return result
+
+    async def stream_query_with_steps(self, query: str, language: str = 'en') -> AsyncIterator[Dict[str, Any]]:
+        """Run the RAG pipeline, yielding each step as soon as it finishes.
+
+        Emits ``step`` events for the five pipeline stages, ``token`` events
+        while the answer is generated and a final ``result`` event carrying
+        the same payload as ``process_query_with_steps``.
+        """
         start_time = time.time()
         steps = []
 
@@ -270,10 +534,11 @@ class OpenAIRAGService:
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
 
         # Step 2: Query Embedding
         step_start = time.time()
-        query_embedding = self._generate_query_embedding(processed_query)
+        query_embedding, cache_hit = await self._generate_query_embedding(processed_query, language)
         step_time = time.time() - step_start
 
         steps.append({
@@ -301,10 +566,12 @@ class OpenAIRAGService:
                     "mean": float(np.mean(query_embedding)),
                     "std_dev": float(np.std(query_embedding))
                 },
-                "semantic_encoding": f"Query encoded into high-dimensional semantic space representing meaning and context"
+                "semantic_encoding": f"Query encoded into high-dimensional semantic space representing meaning and context",
+                "embedding_cache": {"hit": cache_hit, **self.query_cache.stats()}
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
 
         # Step 3: Vector Search
         step_start = time.time()
@@ -335,7 +602,9 @@ class OpenAIRAGService:
                     "method": "Cosine Similarity",
                     "formula": "cos(θ) = (A·B) / (||A|| × ||B||)",
                     "database_size": len(self.candies),
-                    "vector_dimensions": 1536
+                    "vector_dimensions": 1536,
+                    "index_type": self.vector_index.kind,
+                    "index_memory_bytes": self.vector_index.memory_bytes()
                 },
                 "top_matches": top_matches,
                 "similarity_distribution": {
@@ -346,10 +615,14 @@ class OpenAIRAGService:
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
 
         # Step 4: Context Preparation
         step_start = time.time()
-        context_text = "\n".join([f"- {item['candy']['name']}: {item['candy']['description']}" for item in similar_candies])
+        packed = self._pack_context(similar_candies)
+        context_text = packed["text"]
+        prompt_tokens = self.context_packer.tokenizer.count_messages(self._build_messages(query, context_text, language))
+        candies_by_id = {item['candy']['id']: item for item in similar_candies}
         step_time = time.time() - step_start
 
         steps.append({
@@ -361,29 +634,41 @@ class OpenAIRAGService:
             },
             "data": {
                 "context_window": {
-                    "total_tokens": len(context_text.split()),
-                    "max_context_length": 4096,
-                    "utilization": f"{(len(context_text.split()) / 4096 * 100):.1f}%",
-                    "chunks_included": len(similar_candies)
+                    "total_tokens": packed["tokens"],
+                    "max_context_length": packed["budget"],
+                    "utilization": f"{(packed['tokens'] / packed['budget'] * 100):.1f}%",
+                    "chunks_included": len(packed["blocks"]),
+                    "prompt_tokens": prompt_tokens,
+                    "token_counts": self.context_packer.tokenizer.accuracy
                 },
+                "token_budget": self.context_packer.report(packed),
                 "context_structure": [
                     {
-                        "candy_name": item['candy']['name'],
-                        "similarity_rank": item['rank'],
-                        "token_count": len(item['candy']['description'].split()),
-                        "metadata": f"Sweetness: {item['candy']['sweetness']}/10"
+                        "candy_name": candies_by_id[block["key"]]['candy']['name'],
+                        "similarity_rank": candies_by_id[block["key"]]['rank'],
+                        "token_count": block["tokens"],
+                        "truncated": block["truncated"],
+                        "metadata": f"Sweetness: {candies_by_id[block['key']]['candy']['sweetness']}/10"
                     }
-                    for item in similar_candies
+                    for block in packed["blocks"]
                 ],
                 "context_preview": context_text[:200] + "..." if len(context_text) > 200 else context_text
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
 
         # Step 5: AI Generation
         step_start = time.time()
-        final_answer = self._generate_ai_response(query, similar_candies, language)
+        final_answer, cached_answer, cached_response = "", None, None
+        async for chunk in self._generate_ai_response(query, query_embedding, similar_candies, context_text, language):
+            if "token" in chunk:
+                yield {"event": "token", "data": {"text": chunk["token"]}}
+            else:
+                final_answer, cached_answer, cached_response = chunk["answer"], chunk["cache"], chunk["response_cache"]
         step_time = time.time() - step_start
+        # SQLite reads stay off the event loop
+        response_cache_stats = await asyncio.get_running_loop().run_in_executor(None, self.response_cache.stats)
 
         steps.append({
             "step": "ai_generation",
@@ -397,7 +682,9 @@ class OpenAIRAGService:
                     "model": "gpt-3.5-turbo",
                     "provider": "OpenAI",
                     "max_tokens": 150,
-                    "temperature": 0.7
+                    "temperature": self.response_cache.temperature(0.7),
+                    "prompt_tokens": 0 if cached_answer or cached_response else prompt_tokens,
+                    "token_counts": self.context_packer.tokenizer.accuracy
                 },
                 "prompt_engineering": {
                     "system_prompt": "Friendly candy store expert providing contextual responses",
@@ -408,15 +695,31 @@ class OpenAIRAGService:
                     "character_count": len(final_answer),
                     "word_count": len(final_answer.split()),
                     "sources_referenced": len(similar_candies),
-                    "generation_method": "Real OpenAI API call with context"
+                    "generation_method": (
+                        "Semantic answer cache hit" if cached_answer
+                        else "Persistent response cache hit" if cached_response
+                        else "Real OpenAI API call with context"
+                    )
+                },
+                "answer_cache": {
+                    "hit": cached_answer is not None,
+                    "matched_query": cached_answer["matched_query"] if cached_answer else None,
+                    "query_similarity": cached_answer["similarity"] if cached_answer else None,
+                    **self.answer_cache.stats()
+                },
+                "response_cache": {
+                    "hit": cached_response is not None,
+                    "age_seconds": cached_response["age_seconds"] if cached_response else None,
+                    **response_cache_stats
                 }
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
 
         total_time = time.time() - start_time
 
-        return {
+        yield {"event": "result", "data": {
             "query": query,
             "language": language,
             "steps": steps,
@@ -426,12 +729,14 @@ class OpenAIRAGService:
             },
             "total_time": total_time,
             "candies_found": [item['candy'] for item in similar_candies]
-        }
+        }}
 
     async def get_all_candies(self) -> List[Dict[str, Any]]:
         """Return all available candies."""
-        return self.candies
+        return list(self.candies)
 
     async def reset_demo(self) -> Dict[str, str]:
         """Reset the demo state."""
+        self.query_cache.clear()
+        self.answer_cache.clear()
         return {"status": "reset", "message": "Demo reset successfully"} 
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a query used for cache keys: lowercase, single spaces."""
+    return " ".join(text.lower().split())
+
+
+class TTLCache:
+    """Bounded in-memory cache with LRU eviction and a per-entry time-to-live."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for ``key`` or ``None``, counting a hit or miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any):
+        """Insert or refresh ``key``, evicting the least recently used entries if full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, self._clock() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters suitable for inclusion in step ``data``."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self._data),
+            "max_size": self.maxsize,
+            "ttl_seconds": self.ttl
+        }
+
+
+def create_query_embedding_cache() -> TTLCache:
+    """Query-embedding cache sized from QUERY_CACHE_SIZE and QUERY_CACHE_TTL."""
+    return TTLCache(
+        maxsize=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("QUERY_CACHE_TTL", "3600"))
+    )
@@ -1,30 +1,175 @@
 import asyncio
+import functools
+import hashlib
 import json
+import math
 import time
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple, AsyncIterator
 import logging
 import os
 from pathlib import Path
 
-import chromadb
-from chromadb.config import Settings
-import openai
-from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from catalog_loader import create_catalog_loader, read_catalog
+from catalog_store import CatalogStore
+from chunking import create_chunker
+from context_packer import create_context_packer
+from filter_index import FilterIndex, active_filters
+from executors import create_inference_executor, create_io_executor
+from hybrid_retriever import HybridRetriever
+from micro_batcher import create_embedding_batcher
+from openai_client import get_async_client, close_async_client
+from query_cache import create_query_embedding_cache, normalize_query
+from response_cache import create_response_cache
+from warmup import StartupTimer
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Model held by each inference worker process when INFERENCE_EXECUTOR=process
+_process_model = None
+
+
+# Built-in demo catalog, used when CATALOG_PATH is not set
+DEMO_CANDIES = [
+    {
+        "id": "1",
+        "name": "Rainbow Gummy Bears",
+        "name_fi": "Sateenkaaren Karhukarkit",
+        "description": "Colorful, chewy gummy bears with fruity flavors. These delightful treats come in five different flavors: strawberry (red), orange (orange), lemon (yellow), apple (green), and grape (purple). Made with real fruit juice and natural colors.",
+        "description_fi": "Värikkäitä, pureskeltavia karhunmuotoisia karkkeja hedelmäisillä mauilla. Nämä ihanat herkut tulevat viidessä eri mausa: mansikka (punainen), appelsiini (oranssi), sitruuna (keltainen), omena (vihreä) ja rypäle (violetti). Valmistettu aidosta hedelmämehusta ja luonnollisista väreistä.",
+        "sweetness": 8,
+        "category": "Gummy",
+        "category_fi": "Kumimaiset",
+        "price": 2.99,
+        "ingredients": ["glucose syrup", "sugar", "gelatin", "fruit juice", "natural flavors", "natural colors"],
+        "allergens": ["may contain traces of nuts"]
+    },
+    {
+        "id": "2", 
+        "name": "Chocolate Dreams",
+        "name_fi": "Suklaa Unet",
+        "description": "Rich, creamy milk chocolate bars with a smooth, velvety texture. Made from premium Belgian cocoa beans, these bars melt perfectly in your mouth. Each bar contains 70% cocoa for the perfect balance of sweetness and depth.",
+        "description_fi": "Rikas, kermainen maitosuklaa joka sulaa suussa. Valmistettu premium belgialaisisita kaakaopavuista. Jokainen levy sisältää 70% kaakaota täydellisen makeus ja syvyys tasapainon saavuttamiseksi.",
+        "sweetness": 7,
+        "category": "Chocolate",
+        "category_fi": "Suklaa", 
+        "price": 4.99,
+        "ingredients": ["cocoa beans", "milk powder", "sugar", "cocoa butter", "vanilla extract"],
+        "allergens": ["contains milk", "may contain nuts"]
+    },
+    {
+        "id": "3",
+        "name": "Sour Space Crystals", 
+        "name_fi": "Happamat Avaruuskiteet",
+        "description": "Ultra-sour candy crystals that pack a punch! These crystalline treats start extremely sour and gradually become sweet. Perfect for sour candy lovers who want an intense flavor experience. Available in cosmic flavors like meteor berry and alien apple.",
+        "description_fi": "Erittäin happamia karkkikiteitä jotka ovat voimakkaita! Nämä kiteisét herkut alkavat erittäin happamina ja muuttuvat vähitellen makeiksi. Täydellisiä happamuuskarkkien ystäville jotka haluavat intensiivisen makuelämyksen. Saatavilla kosmisissa mauissa kuten meteorimarja ja avaruusomena.",
+        "sweetness": 3,
+        "category": "Sour",
+        "category_fi": "Happamat",
+        "price": 3.49,
+        "ingredients": ["citric acid", "sugar", "natural flavors", "artificial colors", "malic acid"],
+        "allergens": ["none"]
+    },
+    {
+        "id": "4",
+        "name": "Fluffy Cloud Marshmallows",
+        "name_fi": "Pörröiset Pilvivaahtokarkit", 
+        "description": "Light, airy marshmallows that feel like eating sweet clouds. These premium marshmallows are perfectly roasted and have a golden exterior with a soft, gooey center. Great for camping, hot chocolate, or eating straight from the bag.",
+        "description_fi": "Kevyitä, ilmavia vaahtokarkkeja jotka tuntuvat kuin söisi makeita pilviä. Nämä premium vaahtokarkit ovat täydellisesti paahdettuja ja niissä on kullanvärinen ulkokuori pehmeän, tahmaisen keskustan kanssa. Loistavia retkeilyyn, kuumaan suklaaseen tai syötäväksi suoraan pussista.",
+        "sweetness": 9,
+        "category": "Marshmallow", 
+        "category_fi": "Vaahtokarkit",
+        "price": 2.49,
+        "ingredients": ["sugar", "corn syrup", "gelatin", "vanilla extract", "salt"],
+        "allergens": ["may contain traces of eggs"]
+    },
+    {
+        "id": "5",
+        "name": "Tropical Fruit Explosion",
+        "name_fi": "Trooppinen Hedelmäräjähdys",
+        "description": "A vibrant mix of tropical fruit-flavored hard candies. Experience the taste of paradise with mango, pineapple, coconut, passion fruit, and guava flavors. Each piece is individually wrapped and bursts with authentic tropical taste.",
+        "description_fi": "Elävä sekoitus trooppisia hedelmiä maistavia kovia karkkeja. Koe paratiisin maku mangon, ananaksen, kookoksen, passionhedelmän ja guaijan mauilla. Jokainen pala on erikseen kääritty ja pursuaa aitoa trooppista makua.",
+        "sweetness": 6,
+        "category": "Hard Candy",
+        "category_fi": "Kovat Karkit", 
+        "price": 3.99,
+        "ingredients": ["sugar", "corn syrup", "natural fruit flavors", "citric acid", "artificial colors"],
+        "allergens": ["none"]
+    }
+]
+
+
+def load_embedding_model(model_name: str, backend: Optional[str] = None):
+    """Embedding model for EMBEDDING_BACKEND: "torch" (SentenceTransformer), "onnx" or "onnx-int8"."""
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend == "torch":
+        # Imported on first use: pulling in PyTorch dominates import time
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        # Optional dependencies in requirements-onnx.txt, only needed for the ONNX Runtime backends
+        from onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(model_name, quantize=backend == "onnx-int8", threads=int(os.getenv("ONNX_THREADS", "0")))
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected 'torch', 'onnx' or 'onnx-int8'")
+
+
+def content_hash(text: str) -> str:
+    """Fingerprint of a document's searchable text; an unchanged hash means the stored vector is still valid."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _load_process_model(model_name: str):
+    global _process_model
+    _process_model = load_embedding_model(model_name)
+
+
+def _encode_in_process(texts: List[str]) -> np.ndarray:
+    return _process_model.encode(texts)
+
+
 class RAGService:
     def __init__(self):
         self.client = None
         self.collection = None
         self.embedding_model = None
-        self.candies_data = []
+        self.embedding_model_name = 'all-MiniLM-L6-v2'
+        self.query_cache = create_query_embedding_cache()
+        # Model inference and blocking vector-store calls run off the event loop
+        self.inference_executor = create_inference_executor(_load_process_model, (self.embedding_model_name,))
+        self.io_executor = create_io_executor()
+        if self.inference_executor.kind == "process":
+            self._encode = _encode_in_process
+        else:
+            self._encode = lambda texts: self.embedding_model.encode(texts)
+        # Concurrent single-query embeddings are coalesced into one encode call
+        self.embedding_batcher = create_embedding_batcher(self._encode, executor=self.inference_executor)
+        # Records, the chunk documents and hashes of each candy and the BM25 keyword
+        # index live on disk and are read on demand, so memory stays flat as the catalog grows
+        self.catalog = CatalogStore()
+        # Long descriptions are embedded as several chunks
+        self.chunker = create_chunker()
+        self.context_chunks = int(os.getenv("CONTEXT_CHUNKS", "2"))
+        # Fits retrieved candies into a prompt token budget
+        self.context_packer = create_context_packer()
+        # Structured-field filter index over the catalog; rebuilt lazily after catalog changes.
+        # Each change bumps the generation so a rebuild started before it is not kept.
+        self.filter_index = None
+        self.filter_generation = 0
+        self.catalog_lock = asyncio.Lock()
+        # JSONL or CSV catalog streamed in at startup instead of the built-in demo catalog
+        self.catalog_path = os.getenv("CATALOG_PATH")
+        self.catalog_loader = create_catalog_loader()
+        self.hybrid_candidate_pool = int(os.getenv("HYBRID_CANDIDATE_POOL", "20"))
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "8"))
         
         # OpenAI API key (you'll need to set this)
-        openai.api_key = os.getenv("OPENAI_API_KEY")
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        # Completions replayed for byte-identical requests, persisted across restarts
+        self.response_cache = create_response_cache()
+        self.startup_timer = StartupTimer("RAGService")
         
         # Translations for UI
         self.translations = {
@@ -50,143 +195,306 @@ class RAGService:
             }
         }
 
+    def preload(self):
+        """Load the embedding model before workers fork.
+
+        Called by serve.py in the parent process so forked workers share the
+        model weights copy-on-write; ``initialize()`` then skips this step.
+        The Chroma client and the catalog store are not preloaded because
+        their connections must not cross a fork; each worker streams the
+        catalog in during ``initialize()``.
+        """
+        with self.startup_timer.measure("embedding_model"):
+            self.embedding_model = load_embedding_model(self.embedding_model_name)
+        logger.info("RAG service preloaded")
+
+    def _create_chroma_client(self):
+        import chromadb
+        from chromadb.config import Settings
+        return chromadb.Client(Settings(
+            chroma_db_impl="duckdb+parquet",
+            persist_directory="./chroma_db"
+        ))
+
     async def initialize(self):
-        """Initialize the RAG service with vector database and sample data"""
+        """Initialize the RAG service with vector database and sample data
+
+        Blocking loads run in worker threads so the event loop keeps serving
+        /health and /ready while the service warms up; each component's load
+        time is recorded in ``startup_timer``.
+        """
+        loop = asyncio.get_running_loop()
         try:
-            # Initialize ChromaDB
-            self.client = chromadb.Client(Settings(
-                chroma_db_impl="duckdb+parquet",
-                persist_directory="./chroma_db"
-            ))
+            # Initialize ChromaDB and the embedding model (unless preloaded by the parent process) concurrently
+            async def load_chroma():
+                with self.startup_timer.measure("chroma"):
+                    self.client = await loop.run_in_executor(None, self._create_chroma_client)
+                    self.collection = await loop.run_in_executor(None, lambda: self.client.get_or_create_collection(
+                        name="candy_store",
+                        metadata={"description": "AI Candy Store knowledge base"}
+                    ))
             
-            # Initialize embedding model
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            async def load_model():
+                if self.embedding_model is None:
+                    with self.startup_timer.measure("embedding_model"):
+                        self.embedding_model = await loop.run_in_executor(None, load_embedding_model, self.embedding_model_name)
             
-            # Load candy data
-            await self._load_candy_data()
+            await asyncio.gather(load_chroma(), load_model())
             
-            # Create or get collection
-            self.collection = self.client.get_or_create_collection(
-                name="candy_store",
-                metadata={"description": "AI Candy Store knowledge base"}
-            )
+            # Load candy data
+            if self.catalog_path:
+                records, source = read_catalog(self.catalog_path), self.catalog_path
+            else:
+                records, source = [dict(candy) for candy in DEMO_CANDIES], "demo catalog"
             
-            # Populate vector database if empty
-            if self.collection.count() == 0:
-                await self._populate_vector_db()
+            # Bring the vector database and the lexical index in line with the catalog,
+            # embedding only new or edited candies
+            with self.startup_timer.measure("vector_db_sync"):
+                await self._sync_vector_db(records, source)
+            with self.startup_timer.measure("filter_index"):
+                self.filter_index = await loop.run_in_executor(self.io_executor, self._build_filter_index)
+            with self.startup_timer.measure("tokenizer"):
+                await loop.run_in_executor(None, self.context_packer.tokenizer.load)
             
-            logger.info("RAG service initialized successfully")
+            logger.info(f"RAG service initialized successfully ({self.startup_timer.summary()})")
             
         except Exception as e:
             logger.error(f"Error initializing RAG service: {str(e)}")
             raise
 
-    async def _load_candy_data(self):
-        """Load sample candy data"""
-        self.candies_data = [
-            {
-                "id": "1",
-                "name": "Rainbow Gummy Bears",
-                "name_fi": "Sateenkaaren Karhukarkit",
-                "description": "Colorful, chewy gummy bears with fruity flavors. These delightful treats come in five different flavors: strawberry (red), orange (orange), lemon (yellow), apple (green), and grape (purple). Made with real fruit juice and natural colors.",
-                "description_fi": "Värikkäitä, pureskeltavia karhunmuotoisia karkkeja hedelmäisillä mauilla. Nämä ihanat herkut tulevat viidessä eri mausa: mansikka (punainen), appelsiini (oranssi), sitruuna (keltainen), omena (vihreä) ja rypäle (violetti). Valmistettu aidosta hedelmämehusta ja luonnollisista väreistä.",
-                "sweetness": 8,
-                "category": "Gummy",
-                "category_fi": "Kumimaiset",
-                "price": 2.99,
-                "ingredients": ["glucose syrup", "sugar", "gelatin", "fruit juice", "natural flavors", "natural colors"],
-                "allergens": ["may contain traces of nuts"]
-            },
-            {
-                "id": "2", 
-                "name": "Chocolate Dreams",
-                "name_fi": "Suklaa Unet",
-                "description": "Rich, creamy milk chocolate bars with a smooth, velvety texture. Made from premium Belgian cocoa beans, these bars melt perfectly in your mouth. Each bar contains 70% cocoa for the perfect balance of sweetness and depth.",
-                "description_fi": "Rikas, kermainen maitosuklaa joka sulaa suussa. Valmistettu premium belgialaisisita kaakaopavuista. Jokainen levy sisältää 70% kaakaota täydellisen makeus ja syvyys tasapainon saavuttamiseksi.",
-                "sweetness": 7,
-                "category": "Chocolate",
-                "category_fi": "Suklaa", 
-                "price": 4.99,
-                "ingredients": ["cocoa beans", "milk powder", "sugar", "cocoa butter", "vanilla extract"],
-                "allergens": ["contains milk", "may contain nuts"]
-            },
-            {
-                "id": "3",
-                "name": "Sour Space Crystals", 
-                "name_fi": "Happamat Avaruuskiteet",
-                "description": "Ultra-sour candy crystals that pack a punch! These crystalline treats start extremely sour and gradually become sweet. Perfect for sour candy lovers who want an intense flavor experience. Available in cosmic flavors like meteor berry and alien apple.",
-                "description_fi": "Erittäin happamia karkkikiteitä jotka ovat voimakkaita! Nämä kiteisét herkut alkavat erittäin happamina ja muuttuvat vähitellen makeiksi. Täydellisiä happamuuskarkkien ystäville jotka haluavat intensiivisen makuelämyksen. Saatavilla kosmisissa mauissa kuten meteorimarja ja avaruusomena.",
-                "sweetness": 3,
-                "category": "Sour",
-                "category_fi": "Happamat",
-                "price": 3.49,
-                "ingredients": ["citric acid", "sugar", "natural flavors", "artificial colors", "malic acid"],
-                "allergens": ["none"]
-            },
-            {
-                "id": "4",
-                "name": "Fluffy Cloud Marshmallows",
-                "name_fi": "Pörröiset Pilvivaahtokarkit", 
-                "description": "Light, airy marshmallows that feel like eating sweet clouds. These premium marshmallows are perfectly roasted and have a golden exterior with a soft, gooey center. Great for camping, hot chocolate, or eating straight from the bag.",
-                "description_fi": "Kevyitä, ilmavia vaahtokarkkeja jotka tuntuvat kuin söisi makeita pilviä. Nämä premium vaahtokarkit ovat täydellisesti paahdettuja ja niissä on kullanvärinen ulkokuori pehmeän, tahmaisen keskustan kanssa. Loistavia retkeilyyn, kuumaan suklaaseen tai syötäväksi suoraan pussista.",
-                "sweetness": 9,
-                "category": "Marshmallow", 
-                "category_fi": "Vaahtokarkit",
-                "price": 2.49,
-                "ingredients": ["sugar", "corn syrup", "gelatin", "vanilla extract", "salt"],
-                "allergens": ["may contain traces of eggs"]
-            },
-            {
-                "id": "5",
-                "name": "Tropical Fruit Explosion",
-                "name_fi": "Trooppinen Hedelmäräjähdys",
-                "description": "A vibrant mix of tropical fruit-flavored hard candies. Experience the taste of paradise with mango, pineapple, coconut, passion fruit, and guava flavors. Each piece is individually wrapped and bursts with authentic tropical taste.",
-                "description_fi": "Elävä sekoitus trooppisia hedelmiä maistavia kovia karkkeja. Koe paratiisin maku mangon, ananaksen, kookoksen, passionhedelmän ja guaijan mauilla. Jokainen pala on erikseen kääritty ja pursuaa aitoa trooppista makua.",
-                "sweetness": 6,
-                "category": "Hard Candy",
-                "category_fi": "Kovat Karkit", 
-                "price": 3.99,
-                "ingredients": ["sugar", "corn syrup", "natural fruit flavors", "citric acid", "artificial colors"],
-                "allergens": ["none"]
-            }
+    @staticmethod
+    def _search_texts(candy: Dict[str, Any]) -> Dict[str, str]:
+        """Searchable text for both languages"""
+        return {
+            language: RAGService._document_text(candy, language, candy["description" if language == "en" else "description_fi"])
+            for language in ("en", "fi")
+        }
+
+    @staticmethod
+    def _document_text(candy: Dict[str, Any], language: str, body: str) -> str:
+        """``body`` framed by the candy's name, category and sweetness so every chunk names its product"""
+        if language == "fi":
+            return f"{candy['name_fi']} - {body} Kategoria: {candy['category_fi']} Makeus: {candy['sweetness']}/10"
+        return f"{candy['name']} - {body} Category: {candy['category']} Sweetness: {candy['sweetness']}/10"
+
+    def _chunk_bodies(self, candy: Dict[str, Any], language: str) -> List[str]:
+        """The candy's description split into chunks; a short description is a single chunk"""
+        return self.chunker.split(candy["description" if language == "en" else "description_fi"]) or [""]
+
+    @staticmethod
+    def _document_id(candy_id: str, language: str, chunk: int) -> str:
+        # The first chunk keeps the one-document-per-language id
+        return f"{candy_id}_{language}" if chunk == 0 else f"{candy_id}_{language}#{chunk}"
+
+    def _catalog_documents(self, candies: List[Dict[str, Any]]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Vector database documents for ``candies``, one per chunk and language: ``{doc_id: (text, metadata)}``
+
+        ``content_hash`` covers the embedded text and decides re-embedding;
+        ``record_hash`` covers the whole record and decides metadata updates.
+        The metadata's ``id`` and ``chunk`` map each chunk to its candy.
+        """
+        documents = {}
+        for candy in candies:
+            record_hash = content_hash(json.dumps(candy, sort_keys=True, ensure_ascii=False))
+            for language in ("en", "fi"):
+                for chunk, body in enumerate(self._chunk_bodies(candy, language)):
+                    text = self._document_text(candy, language, body)
+                    documents[self._document_id(candy["id"], language, chunk)] = (text, {
+                        **candy,
+                        "language": language,
+                        "chunk": chunk,
+                        "search_text": text,
+                        "content_hash": content_hash(text),
+                        "record_hash": record_hash
+                    })
+        return documents
+
+    async def _load_stored_hashes(self, page_size: int = 1000):
+        """Copy the hashes and chunk-to-candy mapping of every stored document into the catalog store, a page at a time"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.io_executor, self.catalog.clear_documents)
+        offset = 0
+        while True:
+            page = await loop.run_in_executor(self.io_executor, functools.partial(
+                self.collection.get, include=["metadatas"], limit=page_size, offset=offset
+            ))
+            rows = []
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                metadata = metadata or {}
+                mapped = "id" in metadata and "language" in metadata
+                rows.append((
+                    doc_id,
+                    metadata["id"] if mapped else None,
+                    metadata["language"] if mapped else None,
+                    metadata.get("content_hash"),
+                    metadata.get("record_hash")
+                ))
+            await loop.run_in_executor(self.io_executor, self.catalog.put_documents, rows)
+            if len(page["ids"]) < page_size:
+                return
+            offset += page_size
+
+    async def _embed_changed(self, documents: Dict[str, Tuple[str, Dict[str, Any]]]) -> Tuple[List[str], Optional[np.ndarray]]:
+        """Embed the documents whose content hash differs from the stored one"""
+        stored = await asyncio.get_running_loop().run_in_executor(self.io_executor, self.catalog.document_hashes, list(documents))
+        embed_ids = [
+            doc_id for doc_id, (_, metadata) in documents.items()
+            if stored.get(doc_id, (None, None))[0] != metadata["content_hash"]
         ]
+        if not embed_ids:
+            return embed_ids, None
+        texts = [documents[doc_id][0] for doc_id in embed_ids]
+        embeddings = await asyncio.get_running_loop().run_in_executor(self.inference_executor, self._encode, texts)
+        return embed_ids, np.asarray(embeddings)
+
+    async def _write_documents(
+        self,
+        documents: Dict[str, Tuple[str, Dict[str, Any]]],
+        embed_ids: List[str],
+        embeddings: Optional[np.ndarray]
+    ) -> List[str]:
+        """Upsert freshly embedded documents and update the metadata of edited but unchanged-text ones
+
+        Returns the ids of the documents refreshed without re-embedding.
+        """
+        loop = asyncio.get_running_loop()
+        embedded = set(embed_ids)
+        stored = await loop.run_in_executor(self.io_executor, self.catalog.document_hashes, list(documents))
+        refresh_ids = [
+            doc_id for doc_id, (_, metadata) in documents.items()
+            if doc_id not in embedded and stored.get(doc_id, (None, None))[1] != metadata["record_hash"]
+        ]
+        
+        if embed_ids:
+            await loop.run_in_executor(self.io_executor, functools.partial(
+                self.collection.upsert,
+                ids=embed_ids,
+                embeddings=embeddings.tolist(),
+                documents=[documents[doc_id][0] for doc_id in embed_ids],
+                metadatas=[documents[doc_id][1] for doc_id in embed_ids]
+            ))
+        
+        if refresh_ids:
+            # Text unchanged: the stored vector stays valid
+            await loop.run_in_executor(self.io_executor, functools.partial(
+                self.collection.update,
+                ids=refresh_ids,
+                metadatas=[documents[doc_id][1] for doc_id in refresh_ids]
+            ))
+        
+        await loop.run_in_executor(self.io_executor, self.catalog.put_documents, [
+            (doc_id, metadata["id"], metadata["language"], metadata["content_hash"], metadata["record_hash"])
+            for doc_id, metadata in ((doc_id, documents[doc_id][1]) for doc_id in embed_ids + refresh_ids)
+        ])
+        return refresh_ids
+
+    async def _delete_documents(self, doc_ids: List[str]):
+        """Remove documents and their vectors from the vector database"""
+        if not doc_ids:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.io_executor, functools.partial(self.collection.delete, ids=doc_ids))
+        await loop.run_in_executor(self.io_executor, self.catalog.delete_documents, doc_ids)
+
+    async def _sync_vector_db(self, records: Iterable[Dict[str, Any]], source: str = "") -> Dict[str, Any]:
+        """Diff a full catalog against the vector database by content hash
+
+        ``records`` is the whole catalog and the source of truth: it is
+        streamed through ``upsert_candies`` in chunks, so new or edited
+        candies are embedded while unchanged ones keep their vectors, and
+        stored documents of candies missing from it are deleted afterwards.
+        """
+        await self._load_stored_hashes()
+        await asyncio.get_running_loop().run_in_executor(self.io_executor, self.catalog.clear_records)
+        
+        async def process_chunk(chunk: List[Dict[str, Any]]) -> int:
+            return (await self.upsert_candies(chunk))["embedded_documents"]
+        
+        report = await self.catalog_loader.load(records, process_chunk, source)
+        
+        # Whatever no current candy claims: removed candies and legacy documents
+        stale = await asyncio.get_running_loop().run_in_executor(self.io_executor, self.catalog.orphan_documents)
+        await self._delete_documents(stale)
+        logger.info(f"Vector database synced: {report['embedded_documents']} documents embedded, {len(stale)} deleted")
+        return {**report, "deleted_documents": len(stale)}
 
-    async def _populate_vector_db(self):
-        """Populate the vector database with candy data"""
-        documents = []
-        metadatas = []
-        ids = []
+    async def ingest_catalog(self, records: Iterable[Dict[str, Any]], source: str = "") -> Dict[str, Any]:
+        """Stream catalog records into the store in chunks (adds and edits; nothing is deleted)"""
+        async def process_chunk(chunk: List[Dict[str, Any]]) -> int:
+            return (await self.upsert_candies(chunk))["embedded_documents"]
         
-        for candy in self.candies_data:
-            # Create searchable text for both languages
-            en_text = f"{candy['name']} - {candy['description']} Category: {candy['category']} Sweetness: {candy['sweetness']}/10"
-            fi_text = f"{candy['name_fi']} - {candy['description_fi']} Kategoria: {candy['category_fi']} Makeus: {candy['sweetness']}/10"
+        return await self.catalog_loader.load(records, process_chunk, source)
+
+    def ingest_progress(self) -> Dict[str, Any]:
+        """Progress and throughput of the current or last catalog load"""
+        return self.catalog_loader.progress.snapshot()
+
+    async def upsert_candies(self, candies: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Add or edit candies; only chunks whose searchable text changed are re-embedded"""
+        loop = asyncio.get_running_loop()
+        documents = self._catalog_documents(candies)
+        # Embed outside the lock so concurrent chunks keep the inference executor busy
+        embed_ids, embeddings = await self._embed_changed(documents)
+        
+        async with self.catalog_lock:
+            stored = await loop.run_in_executor(self.io_executor, self.catalog.candy_documents, [candy["id"] for candy in candies])
+            known = {candy["id"] for candy in candies if candy["id"] in stored}
+            refreshed = await self._write_documents(documents, embed_ids, embeddings)
+            changed = {documents[doc_id][1]["id"] for doc_id in embed_ids + refreshed}
             
-            # Add English version
-            documents.append(en_text)
-            metadatas.append({**candy, "language": "en", "search_text": en_text})
-            ids.append(f"{candy['id']}_en")
+            # Chunks a shorter text no longer produces are dropped
+            obsolete = []
+            for candy_id, candy_chunks in stored.items():
+                dropped = [doc_id for doc_id in candy_chunks if doc_id not in documents]
+                if dropped:
+                    obsolete.extend(dropped)
+                    changed.add(candy_id)
+            await self._delete_documents(obsolete)
             
-            # Add Finnish version  
-            documents.append(fi_text)
-            metadatas.append({**candy, "language": "fi", "search_text": fi_text})
-            ids.append(f"{candy['id']}_fi")
-        
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(documents)
-        
-        # Add to collection
-        self.collection.add(
-            embeddings=embeddings.tolist(),
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+            # Records and keyword index follow the vector database
+            await loop.run_in_executor(
+                self.io_executor, self.catalog.put_records, [(candy, self._search_texts(candy)) for candy in candies]
+            )
+            self.filter_index = None
+            self.filter_generation += 1
         
-        logger.info(f"Added {len(documents)} documents to vector database")
+        added = [candy["id"] for candy in candies if candy["id"] not in known]
+        updated = [candy["id"] for candy in candies if candy["id"] in known and candy["id"] in changed]
+        unchanged = [candy["id"] for candy in candies if candy["id"] in known and candy["id"] not in changed]
+        logger.debug(f"Catalog upsert: {len(added)} added, {len(updated)} updated, {len(embed_ids)} documents embedded")
+        return {"added": added, "updated": updated, "unchanged": unchanged, "embedded_documents": len(embed_ids)}
 
-    async def process_query_with_steps(self, query: str, language: str = "en") -> Dict[str, Any]:
+    async def delete_candies(self, candy_ids: List[str]) -> Dict[str, Any]:
+        """Remove candies from the catalog, the vector database and the keyword index"""
+        loop = asyncio.get_running_loop()
+        async with self.catalog_lock:
+            existing = await loop.run_in_executor(self.io_executor, self.catalog.existing_ids, candy_ids)
+            deleted = [candy_id for candy_id in dict.fromkeys(candy_ids) if candy_id in existing]
+            missing = [candy_id for candy_id in candy_ids if candy_id not in existing]
+            
+            stored = await loop.run_in_executor(self.io_executor, self.catalog.candy_documents, deleted)
+            await self._delete_documents([doc_id for documents in stored.values() for doc_id in documents])
+            await loop.run_in_executor(self.io_executor, self.catalog.delete_records, deleted)
+            self.filter_index = None
+            self.filter_generation += 1
+            
+            logger.info(f"Catalog delete: {len(deleted)} removed")
+            return {"deleted": deleted, "missing": missing}
+
+    async def process_query_with_steps(self, query: str, language: str = "en", filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Process query through RAG pipeline with step-by-step visualization"""
+        result = None
+        async for event in self.stream_query_with_steps(query, language, filters):
+            if event["event"] == "result":
+                result = event["data"]
+        return result
+
+    async def stream_query_with_steps(self, query: str, language: str = "en", filters: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Run the RAG pipeline, yielding "step" events as stages finish, "token" events during generation and a final "result" event
+
+        ``filters`` (see ``FilterIndex``) restrict retrieval to candies whose
+        structured fields match before any vector is scored.
+        """
         steps = []
         start_time = time.time()
         
@@ -209,10 +517,11 @@ class RAGService:
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
         # Step 2: Query Embedding
         step_start = time.time()
-        query_embedding = await self._create_embedding(processed_query)
+        query_embedding, cache_hit = await self._create_embedding(processed_query, language)
         step_time = time.time() - step_start
         
         steps.append({
@@ -224,14 +533,19 @@ class RAGService:
             },
             "data": {
                 "embedding_dimensions": len(query_embedding),
-                "embedding_sample": query_embedding[:5].tolist()  # Show first 5 dimensions
+                "embedding_sample": query_embedding[:5].tolist(),  # Show first 5 dimensions
+                "embedding_cache": {"hit": cache_hit, **self.query_cache.stats()},
+                "embedding_batching": self.embedding_batcher.stats()
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
         # Step 3: Vector Search
         step_start = time.time()
-        search_results = await self._vector_search(query_embedding, language)
+        filters = active_filters(filters)
+        allowed = await self._matching_candies(filters)
+        search_results = await self._vector_search(processed_query, query_embedding, language, allowed=allowed)
         step_time = time.time() - step_start
         
         steps.append({
@@ -243,21 +557,33 @@ class RAGService:
             },
             "data": {
                 "results_found": len(search_results),
+                "retrieval_method": "Hybrid dense + BM25 with reciprocal-rank fusion",
                 "top_matches": [
                     {
                         "candy_name": result["name"] if language == "en" else result["name_fi"],
                         "similarity_score": round(result["similarity"], 3),
+                        "fusion_score": round(result["fusion_score"], 4),
+                        "dense_rank": result["dense_rank"],
+                        "lexical_rank": result["lexical_rank"],
                         "category": result["category"] if language == "en" else result["category_fi"]
                     }
                     for result in search_results[:3]
-                ]
+                ],
+                "filters": {
+                    "applied": filters or {},
+                    "matching_candies": len(self.catalog) if allowed is None else len(allowed),
+                    "catalog_size": len(self.catalog)
+                }
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
         # Step 4: Context Preparation
         step_start = time.time() 
-        context = await self._prepare_context(search_results, language)
+        packed = await self._prepare_context(search_results, language, query_embedding)
+        context = packed["text"]
+        prompt_tokens = self.context_packer.tokenizer.count_messages(self._build_messages(query, context, language))
         step_time = time.time() - step_start
         
         steps.append({
@@ -269,15 +595,28 @@ class RAGService:
             },
             "data": {
                 "context_length": len(context),
-                "candies_included": len(search_results)
+                "candies_included": len(packed["blocks"]),
+                "chunks_included": sum(block["passages"] for block in packed["blocks"]),
+                "chunking": self.chunker.config(),
+                "token_budget": {
+                    **self.context_packer.report(packed),
+                    "prompt_tokens": prompt_tokens
+                }
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
         # Step 5: AI Generation
         step_start = time.time()
-        final_answer = await self._generate_answer(query, context, language)
+        final_answer, cached_response = {}, None
+        async for chunk in self._generate_answer(query, context, language):
+            if "token" in chunk:
+                yield {"event": "token", "data": {"text": chunk["token"]}}
+            else:
+                final_answer, cached_response = chunk["answer"], chunk["cache"]
         step_time = time.time() - step_start
+        response_cache_stats = await asyncio.get_running_loop().run_in_executor(self.io_executor, self.response_cache.stats)
         
         steps.append({
             "step": "ai_generation",
@@ -288,79 +627,255 @@ class RAGService:
             },
             "data": {
                 "answer_length": len(final_answer[language]),
-                "sources_used": len(search_results)
+                "sources_used": len(packed["blocks"]),
+                "prompt_tokens": 0 if cached_response else prompt_tokens,
+                "token_counts": self.context_packer.tokenizer.accuracy,
+                "response_cache": {
+                    "hit": cached_response is not None,
+                    "age_seconds": cached_response["age_seconds"] if cached_response else None,
+                    **response_cache_stats
+                }
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
-        return {
+        yield {"event": "result", "data": {
+            "query": query,
+            "language": language,
             "steps": steps,
-            "final_answer": final_answer
-        }
+            "final_answer": final_answer,
+            "total_time": time.time() - start_time
+        }}
+
+    async def process_batch(self, queries: List[str], language: str = "en", top_k: int = 3, generate: bool = True, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Answer many queries at once without per-step visualization.
+
+        All cache-missing queries are embedded in one model call and searched
+        with one Chroma query; answers are generated concurrently, at most
+        ``batch_concurrency`` at a time. Results follow the order of ``queries``.
+        """
+        if not queries:
+            return []
+        processed = [await self._process_query(query, language) for query in queries]
+        embeddings, cache_hits = await self._create_embeddings(processed, language)
+        allowed = await self._matching_candies(active_filters(filters))
+        fused = await self._retriever(language, allowed).retrieve_batch(processed, list(embeddings), top_k)
+        search_results = [await self._search_results(hits, language) for hits in fused]
+        logger.info(f"Batch of {len(queries)} queries: {cache_hits} embedding cache hits")
+        
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        
+        async def answer(query: str, query_embedding: np.ndarray, search_results: List[Dict]) -> Dict[str, Any]:
+            final_answer = None
+            if generate:
+                async with semaphore:
+                    packed = await self._prepare_context(search_results, language, query_embedding)
+                    async for chunk in self._generate_answer(query, packed["text"], language):
+                        if "answer" in chunk:
+                            final_answer = chunk["answer"]
+            return {"query": query, "results": search_results, "final_answer": final_answer}
+        
+        return await asyncio.gather(*[
+            answer(query, embedding, results)
+            for query, embedding, results in zip(queries, embeddings, search_results)
+        ])
 
     async def _process_query(self, query: str, language: str) -> str:
         """Process and clean the user query"""
         # Simple processing - in a real app you might do more sophisticated NLP
         return query.strip().lower()
 
-    async def _create_embedding(self, text: str) -> np.ndarray:
-        """Create embedding for the query"""
+    async def _create_embedding(self, text: str, language: str) -> Tuple[np.ndarray, bool]:
+        """Create embedding for the query, reusing cached vectors for repeated queries"""
+        cache_key = (normalize_query(text), self.embedding_model_name, language)
+        embedding = self.query_cache.get(cache_key)
+        if embedding is not None:
+            return embedding, True
+
         await asyncio.sleep(0.1)  # Simulate processing time
-        return self.embedding_model.encode([text])[0]
+        embedding = await self.embedding_batcher.submit(text)
+        self.query_cache.set(cache_key, embedding)
+        return embedding, False
 
-    async def _vector_search(self, query_embedding: np.ndarray, language: str, top_k: int = 5) -> List[Dict]:
-        """Search the vector database for relevant candies"""
-        await asyncio.sleep(0.2)  # Simulate processing time
+    async def _create_embeddings(self, texts: List[str], language: str) -> Tuple[np.ndarray, int]:
+        """Embed many queries with one model call for all cache misses; returns the matrix and the hit count"""
+        keys = [(normalize_query(text), self.embedding_model_name, language) for text in texts]
+        first_text = {}
+        for key, text in zip(keys, texts):
+            first_text.setdefault(key, text)
+        cached = {key: self.query_cache.get(key) for key in first_text}
+        missing = [key for key, embedding in cached.items() if embedding is None]
+        
+        if missing:
+            loop = asyncio.get_running_loop()
+            missing_texts = [first_text[key] for key in missing]
+            encoded = await loop.run_in_executor(self.inference_executor, self._encode, missing_texts)
+            for key, embedding in zip(missing, encoded):
+                cached[key] = embedding
+                self.query_cache.set(key, embedding)
         
+        missing_keys = set(missing)
+        hits = sum(1 for key in keys if key not in missing_keys)
+        return np.stack([np.asarray(cached[key], dtype=np.float32) for key in keys]), hits
+
+    async def _matching_candies(self, filters: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+        """Ids of the candies passing ``filters``, or ``None`` when nothing is filtered"""
+        if not filters:
+            return None
+        filter_index = self.filter_index
+        if filter_index is None:
+            generation = self.filter_generation
+            filter_index = await asyncio.get_running_loop().run_in_executor(self.io_executor, self._build_filter_index)
+            # A catalog change while building leaves this index stale; use it for this query only
+            if self.filter_generation == generation:
+                self.filter_index = filter_index
+        return filter_index.matching_ids(filters)
+
+    def _build_filter_index(self) -> FilterIndex:
+        """Filter index over the whole catalog, streamed from the store (blocking)"""
+        return FilterIndex(self.catalog.iter_records())
+
+    def _dense_search(self, query_embedding: np.ndarray, language: str, top_n: int, allowed: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Rank candies by Chroma vector distance (blocking)"""
+        return self._dense_search_batch([query_embedding], language, top_n, allowed)[0]
+
+    def _dense_search_batch(self, query_embeddings: List[np.ndarray], language: str, top_n: int, allowed: Optional[List[str]] = None) -> List[List[Tuple[str, float]]]:
+        """Rank candies for many query embeddings with one Chroma query (blocking)
+
+        Chunks are searched and each candy is scored by its best chunk; enough
+        chunks are fetched to cover ``top_n`` candies on average. With
+        ``allowed``, Chroma only scores the chunks of those candies.
+        """
+        documents = self.catalog.document_count(language) or len(self.catalog)
+        chunks_per_candy = documents / max(1, len(self.catalog))
+        where = {"language": language}
+        if allowed is not None:
+            if not allowed:
+                return [[] for _ in query_embeddings]
+            # Never ask for more results than the filtered set holds
+            documents = self.catalog.document_count(language, allowed) or len(allowed)
+            where = {"$and": [where, {"id": {"$in": list(allowed)}}]}
         results = self.collection.query(
-            query_embeddings=[query_embedding.tolist()],
-            n_results=top_k,
-            where={"language": language}
+            query_embeddings=[np.asarray(embedding).tolist() for embedding in query_embeddings],
+            n_results=max(1, min(math.ceil(top_n * chunks_per_candy), documents)),
+            where=where
         )
         
+        rankings = []
+        for metadatas, distances in zip(results['metadatas'], results['distances']):
+            # Results come best first, so the first chunk seen is the candy's best
+            best = {}
+            for metadata, distance in zip(metadatas, distances):
+                # Convert distance to similarity (higher is better)
+                best.setdefault(metadata["id"], 1 / (1 + distance))
+            rankings.append(list(best.items())[:top_n])
+        return rankings
+
+    def _best_chunks(self, query_embedding: np.ndarray, search_results: List[Dict], language: str) -> Dict[str, List[str]]:
+        """The ``context_chunks`` chunks of each multi-chunk result closest to the query, in text order (blocking)"""
+        stored = self.catalog.candy_documents([result["id"] for result in search_results], language)
+        chunk_ids = [doc_id for candy_chunks in stored.values() if len(candy_chunks) > 1 for doc_id in candy_chunks]
+        if not chunk_ids:
+            return {}
+        
+        vectors = self.collection.get(ids=chunk_ids, include=["embeddings", "metadatas"])
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scored = {}
+        for embedding, metadata in zip(vectors["embeddings"], vectors["metadatas"]):
+            vector = np.asarray(embedding, dtype=np.float32)
+            score = float(vector @ query) / (float(np.linalg.norm(vector)) or 1.0)
+            scored.setdefault(metadata["id"], []).append((score, metadata["chunk"]))
+        
+        candies = self.catalog.get_many(scored)
+        best = {}
+        for candy_id, chunks in scored.items():
+            candy = candies.get(candy_id)
+            if candy is None:
+                continue
+            bodies = self._chunk_bodies(candy, language)
+            top = sorted(chunk for _, chunk in sorted(chunks, reverse=True)[:self.context_chunks])
+            best[candy_id] = [bodies[chunk] for chunk in top if chunk < len(bodies)]
+        return best
+
+    def _lexical_search(self, query_text: str, language: str, top_n: int, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Rank candies by BM25 keyword score (blocking)"""
+        return self.catalog.search_keywords(query_text, language, top_n, allowed)
+
+    async def _vector_search(self, query_text: str, query_embedding: np.ndarray, language: str, top_k: int = 3, allowed: Optional[List[str]] = None) -> List[Dict]:
+        """Hybrid search: dense vector and BM25 rankings fused with reciprocal-rank fusion"""
+        await asyncio.sleep(0.2)  # Simulate processing time
+        
+        fused = await self._retriever(language, allowed).retrieve(query_text, query_embedding, top_k)
+        return await self._search_results(fused, language)
+
+    def _retriever(self, language: str, allowed: Optional[List[str]] = None) -> HybridRetriever:
+        """Hybrid dense + BM25 retriever restricted to one language and, optionally, to ``allowed`` candies"""
+        allowed_set = None if allowed is None else set(allowed)
+        return HybridRetriever(
+            dense_search=lambda embedding, top_n: self._dense_search(embedding, language, top_n, allowed),
+            lexical_search=lambda text, top_n: self._lexical_search(text, language, top_n, allowed_set),
+            candidate_pool=self.hybrid_candidate_pool,
+            executor=self.io_executor,
+            dense_search_batch=lambda embeddings, top_n: self._dense_search_batch(embeddings, language, top_n, allowed)
+        )
+
+    async def _search_results(self, fused: List[Dict[str, Any]], language: str) -> List[Dict]:
+        """Candy records, loaded from the catalog store, annotated with the retriever's ranks and scores"""
+        candies = await asyncio.get_running_loop().run_in_executor(
+            self.io_executor, self.catalog.get_many, [hit["id"] for hit in fused]
+        )
         search_results = []
-        for i, (doc, metadata, distance) in enumerate(zip(
-            results['documents'][0], 
-            results['metadatas'][0], 
-            results['distances'][0]
-        )):
-            # Convert distance to similarity (higher is better)
-            similarity = 1 / (1 + distance)
-            
+        for hit in fused:
+            candy = candies.get(hit["id"])
+            if candy is None:
+                continue  # Deleted while the query was in flight
             search_results.append({
-                **metadata,
-                "similarity": similarity,
-                "rank": i + 1
+                **candy,
+                "language": language,
+                # Dense similarity for display; lexical-only hits have none
+                "similarity": hit["dense_score"] or 0.0,
+                "fusion_score": hit["fusion_score"],
+                "dense_rank": hit["dense_rank"],
+                "lexical_rank": hit["lexical_rank"],
+                "lexical_score": hit["lexical_score"],
+                "rank": len(search_results) + 1
             })
         
         return search_results
 
-    async def _prepare_context(self, search_results: List[Dict], language: str) -> str:
-        """Prepare context from search results"""
+    async def _prepare_context(self, search_results: List[Dict], language: str, query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Pack search results into the context token budget, most relevant first
+
+        Candies whose description was chunked contribute only their chunks
+        closest to the query. Returns the ``ContextPacker.pack`` result; its
+        ``text`` is the context.
+        """
         await asyncio.sleep(0.1)  # Simulate processing time
         
-        context_parts = []
+        best_chunks = {}
+        if query_embedding is not None:
+            best_chunks = await asyncio.get_running_loop().run_in_executor(
+                self.io_executor, self._best_chunks, query_embedding, search_results, language
+            )
+        
+        blocks = []
         for result in search_results:
             name = result["name"] if language == "en" else result["name_fi"]
-            description = result["description"] if language == "en" else result["description_fi"] 
+            description = result["description"] if language == "en" else result["description_fi"]
             category = result["category"] if language == "en" else result["category_fi"]
-            
-            context_parts.append(
-                f"Candy: {name}\n"
-                f"Category: {category}\n" 
-                f"Description: {description}\n"
-                f"Sweetness Level: {result['sweetness']}/10\n"
-                f"Price: ${result['price']}\n"
-                f"---"
-            )
+            blocks.append({
+                "key": result["id"],
+                "header": f"Candy: {name}\nCategory: {category}\nDescription: ",
+                "passages": best_chunks.get(result["id"]) or [description],
+                "footer": f"\nSweetness Level: {result['sweetness']}/10\nPrice: ${result['price']}\n---"
+            })
         
-        return "\n".join(context_parts)
+        return self.context_packer.pack(blocks)
 
-    async def _generate_answer(self, query: str, context: str, language: str) -> Dict[str, str]:
-        """Generate AI answer using the context"""
-        await asyncio.sleep(0.5)  # Simulate AI processing time
-        
-        # System prompts for different languages
+    def _build_messages(self, query: str, context: str, language: str) -> List[Dict[str, str]]:
+        """Chat messages sent to the model for ``query`` with ``context``"""
         system_prompts = {
             "en": """You are a friendly AI assistant working at a magical candy store. 
             Use the provided candy information to answer questions about candies in a fun, enthusiastic way.
@@ -378,13 +893,56 @@ class RAGService:
             "fi": f"Kysymys: {query}\n\nKarkkitieto:\n{context}\n\nAnna hyödyllinen vastaus karkeista yllä olevan tiedon perusteella."
         }
         
-        try:
-            # Try OpenAI first
-            if openai.api_key:
-                response = await self._call_openai(system_prompts[language], user_prompts[language])
-                return {language: response}
-        except Exception as e:
-            logger.warning(f"OpenAI call failed: {e}, using fallback")
+        return [
+            {"role": "system", "content": system_prompts[language]},
+            {"role": "user", "content": user_prompts[language]}
+        ]
+
+    def _chat_request(self, query: str, context: str, language: str) -> Dict[str, Any]:
+        """Chat completion parameters for ``query``; their hash is the response cache key"""
+        return {
+            "model": "gpt-3.5-turbo",
+            "messages": self._build_messages(query, context, language),
+            "max_tokens": 300,
+            "temperature": self.response_cache.temperature(0.7)
+        }
+
+    async def _generate_answer(self, query: str, context: str, language: str) -> AsyncIterator[Dict[str, Any]]:
+        """Generate AI answer using the context, yielding {"token": ...} chunks and finally {"answer": {language: text}, "cache": ...}
+
+        A byte-identical earlier request is answered from the response
+        cache, in which case ``cache`` holds the entry's age and hit count
+        (it is ``None`` otherwise). A canned answer replaces the model's only
+        if it fails before streaming anything; a stream that breaks part-way
+        raises, so a client never sees real tokens followed by unrelated text.
+        """
+        loop = asyncio.get_running_loop()
+        request = self._chat_request(query, context, language)
+        cached = await loop.run_in_executor(self.io_executor, self.response_cache.get, request)
+        if cached is not None:
+            yield {"token": cached["response"]}
+            yield {"answer": {language: cached["response"]}, "cache": cached}
+            return
+        
+        await asyncio.sleep(0.5)  # Simulate AI processing time
+        
+        # Try OpenAI first
+        if self.openai_api_key:
+            streamed = []
+            try:
+                async for token in self._call_openai(request):
+                    streamed.append(token)
+                    yield {"token": token}
+            except Exception as e:
+                if streamed:
+                    logger.error(f"OpenAI stream failed after {len(streamed)} tokens: {e}")
+                    raise
+                logger.warning(f"OpenAI call failed: {e}, using fallback")
+            else:
+                answer = "".join(streamed)
+                await loop.run_in_executor(self.io_executor, self.response_cache.put, request, answer)
+                yield {"answer": {language: answer}, "cache": None}
+                return
         
         # Fallback response
         fallback_responses = {
@@ -396,28 +954,40 @@ class RAGService:
                   f"Valikoimaamme kuuluu erilaisia makeisia eri mauilla ja tekstuureilla."
         }
         
-        return {language: fallback_responses[language]}
+        yield {"token": fallback_responses[language]}
+        yield {"answer": {language: fallback_responses[language]}, "cache": None}
 
-    async def _call_openai(self, system_prompt: str, user_prompt: str) -> str:
-        """Call OpenAI API"""
+    async def _call_openai(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        """Call OpenAI API with the ``_chat_request`` parameters, yielding response tokens as they stream in"""
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=300,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
+            client = get_async_client(self.openai_api_key)
+            response = await client.chat.completions.create(**request, stream=True)
+            async for chunk in response:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if token:
+                    yield token
         except Exception as e:
             logger.error(f"OpenAI API error: {e}")
             raise
 
     async def get_all_candies(self):
         """Get all candy data for display"""
-        return self.candies_data
+        return await asyncio.get_running_loop().run_in_executor(self.io_executor, lambda: list(self.catalog.iter_records()))
+
+    def executor_stats(self) -> Dict[str, Any]:
+        """Queue depth and utilisation of the inference and I/O executors"""
+        return {
+            "inference": self.inference_executor.stats(),
+            "io": self.io_executor.stats()
+        }
+
+    async def close(self):
+        """Release pooled HTTP connections and worker pools"""
+        await close_async_client()
+        self.inference_executor.shutdown(wait=False)
+        self.io_executor.shutdown(wait=False)
+        self.response_cache.close()
+        self.catalog.close()
 
     async def reset(self):
         """Reset the demo state"""
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class ResponseCache:
+    """Disk-backed cache of chat completions keyed on the exact request.
+
+    Entries are keyed by a SHA-256 of the whole request (model, messages,
+    ``max_tokens``, ``temperature``, ...), so a response is only replayed for
+    a byte-identical request; a catalog change alters the prompt and so
+    misses naturally. Each entry expires ``ttl_seconds`` after it was stored
+    (``0`` keeps it until evicted), and once the store holds more than
+    ``max_entries`` the least recently used entries are evicted.
+
+    By default (``deterministic_only``) only ``temperature == 0`` requests
+    are cached, since sampled answers are not meant to repeat; callers build
+    their requests with ``temperature()`` so that, while the cache is on,
+    they are sent at temperature 0 and can be cached. Turning it off keeps
+    the callers' sampling temperature and caches sampled requests too, so
+    every later identical request gets the first sampled answer back. A
+    ``max_entries`` of 0 disables the cache.
+
+    The SQLite connection is opened on first use in each process: services
+    are constructed before serve.py forks its workers, and a connection must
+    not be shared across a fork.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1000, ttl_seconds: float = 7 * 24 * 3600, deterministic_only: bool = True):
+        self.path = path or os.getenv("RESPONSE_CACHE_PATH", "./response_cache.sqlite3")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.deterministic_only = deterministic_only
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection, opened (and the schema created) on first use; call with ``_lock`` held."""
+        if self._conn is None or self._pid != os.getpid():
+            # A connection inherited across fork is dropped, never used or closed
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " key TEXT PRIMARY KEY,"
+                    " model TEXT NOT NULL,"
+                    " response TEXT NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " expires_at REAL,"
+                    " last_used REAL NOT NULL,"
+                    " hits INTEGER NOT NULL DEFAULT 0)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Content address of a chat completion request."""
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def temperature(self, sampling_temperature: float) -> float:
+        """Temperature to send a request with: 0 while only deterministic requests are cached, else ``sampling_temperature``."""
+        return 0 if self.enabled and self.deterministic_only else sampling_temperature
+
+    def cacheable(self, request: Dict[str, Any]) -> bool:
+        if not self.enabled:
+            return False
+        return not self.deterministic_only or request.get("temperature", 1.0) == 0
+
+    def get(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The cached response for ``request`` with its age, or ``None`` on a miss."""
+        if not self.cacheable(request):
+            return None
+        key = self.make_key(request)
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            row = conn.execute(
+                "SELECT response, created_at, expires_at, hits FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[2] is not None and row[2] <= now:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.hits += 1
+        response, created_at, _, hits = row
+        return {"response": response, "age_seconds": round(now - created_at, 3), "hits": hits + 1}
+
+    def put(self, request: Dict[str, Any], response: str, ttl_seconds: Optional[float] = None):
+        """Store ``response`` for ``request``, expiring it after ``ttl_seconds`` (default: the cache TTL)."""
+        if not self.cacheable(request) or not response:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, expires_at, last_used, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (self.make_key(request), str(request.get("model", "")), response, now, now + ttl if ttl > 0 else None, now)
+            )
+            conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            overflow = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock, self._connection() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def __len__(self) -> int:
+        if not self.enabled:
+            return 0
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self),
+            "max_size": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "deterministic_only": self.deterministic_only
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = self._pid = None
+
+
+def create_response_cache() -> ResponseCache:
+    """Response cache configured from RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL and RESPONSE_CACHE_DETERMINISTIC_ONLY.
+
+    RESPONSE_CACHE_DETERMINISTIC_ONLY defaults to true: the services then
+    generate at temperature 0 and cache those answers. Set to false, they
+    sample at their usual temperature and identical requests always replay
+    the first sampled answer. With RESPONSE_CACHE_SIZE=0 nothing is cached
+    and the services always sample.
+    """
+    return ResponseCache(
+        max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600))),
+        deterministic_only=os.getenv("RESPONSE_CACHE_DETERMINISTIC_ONLY", "true").lower() in ("1", "true", "yes")
+    )
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Preforked production launcher for the RAG demo APIs.
+
+The parent process imports the app, preloads the RAG service (embedding
+model, catalog and index) and binds the listening socket. It then forks the
+workers, which share the preloaded memory copy-on-write and start serving
+immediately. Dead workers are restarted; SIGINT/SIGTERM stop them all.
+
+    python serve.py --app main --workers 4 --port 8000 --cpu-affinity
+"""
+
+import argparse
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is restarted with a delay
+MIN_WORKER_LIFETIME = 5.0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Preforked uvicorn launcher with the RAG service loaded once")
+    parser.add_argument("--app", default=os.getenv("APP_MODULE", "openai_main"),
+                        help="Module exposing `app` and `rag_service` (main, openai_main or simple_main)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+                        help="Number of worker processes (default: WEB_CONCURRENCY or the CPU count)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--cpu-affinity", action="store_true",
+                        help="Pin worker i to the i-th available CPU (Linux only)")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Listening socket created once in the parent and inherited by every worker."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload(module):
+    """Load the module's RAG service in the parent, if it supports it."""
+    service = getattr(module, "rag_service", None)
+    if service is None and hasattr(module, "create_rag_service"):
+        # Apps that build their service lazily during warm-up
+        service = module.rag_service = module.create_rag_service()
+    if not hasattr(service, "preload"):
+        logger.info(f"{type(service).__name__} has no preload step; workers initialize it themselves")
+        return
+    start = time.time()
+    service.preload()
+    logger.info(f"Preloaded {type(service).__name__} in {time.time() - start:.2f}s")
+
+
+def pin_to_cpu(worker: int, cpus: List[int]):
+    """Pin this worker to one CPU and size intra-op thread pools to match."""
+    cpu = cpus[worker % len(cpus)]
+    os.sched_setaffinity(0, {cpu})
+    if "torch" in sys.modules:
+        # Avoid N workers each spinning up a thread per core
+        sys.modules["torch"].set_num_threads(1)
+    logger.info(f"Worker {worker} (pid {os.getpid()}) pinned to CPU {cpu}")
+
+
+def run_worker(worker: int, config: uvicorn.Config, sock: socket.socket, cpus: Optional[List[int]]):
+    """Body of a forked worker; never returns."""
+    # uvicorn installs its own handlers for graceful shutdown
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    status = 0
+    try:
+        if cpus:
+            pin_to_cpu(worker, cpus)
+        uvicorn.Server(config).run(sockets=[sock])
+    except Exception as e:
+        logger.error(f"Worker {worker} crashed: {e}")
+        status = 1
+    finally:
+        os._exit(status)
+
+
+class Supervisor:
+    """Fork, watch and restart worker processes."""
+
+    def __init__(self, config: uvicorn.Config, sock: socket.socket, workers: int, cpus: Optional[List[int]]):
+        self.config = config
+        self.sock = sock
+        self.workers = workers
+        self.cpus = cpus
+        self.children: Dict[int, int] = {}
+        self.started: Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self, worker: int):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(worker, self.config, self.sock, self.cpus)
+        self.children[pid] = worker
+        self.started[worker] = time.time()
+        logger.info(f"Started worker {worker} (pid {pid})")
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Received signal {signum}, stopping {len(self.children)} workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for worker in range(self.workers):
+            self.spawn(worker)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            worker = self.children.pop(pid, None)
+            if worker is None or self.stopping:
+                continue
+            code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+            logger.warning(f"Worker {worker} (pid {pid}) exited with status {code}, restarting")
+            if time.time() - self.started[worker] < MIN_WORKER_LIFETIME:
+                time.sleep(1.0)  # Don't spin on a worker that crashes at startup
+            self.spawn(worker)
+        logger.info("All workers stopped")
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork(); on Windows run the app module directly")
+
+    cpus = None
+    if args.cpu_affinity:
+        if hasattr(os, "sched_getaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+        else:
+            logger.warning("CPU affinity is not supported on this platform; ignoring --cpu-affinity")
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    module = importlib.import_module(args.app)
+    preload(module)
+
+    sock = bind_socket(args.host, args.port)
+    config = uvicorn.Config(module.app, log_level=args.log_level)
+    logger.info(f"Serving {args.app}:app on {args.host}:{args.port} with {args.workers} workers")
+
+    # Move everything loaded so far out of the collector's reach, so GC
+    # passes in the workers don't touch (and un-share) the preloaded pages
+    gc.collect()
+    gc.freeze()
+    Supervisor(config, sock, args.workers, cpus).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import contextlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: builders are not serialized, publishing is still atomic
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class MappedCatalog(Sequence):
+    """Read-only catalog records stored as JSON lines in a memory-mapped file.
+
+    ``offsets.npy`` holds the byte offset of every record, so a row is found
+    without scanning and decoded only when it is accessed. Every process that
+    opens the same directory shares the file through the page cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "catalog.jsonl"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @staticmethod
+    def write(path: str, records: Sequence[Dict[str, Any]]):
+        """Write ``records`` into directory ``path`` in the mapped format."""
+        offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        with open(os.path.join(path, "catalog.jsonl"), "wb") as f:
+            for row, record in enumerate(records):
+                f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                offsets[row + 1] = f.tell()
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+
+    def __len__(self) -> int:
+        return self._offsets.shape[0] - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("catalog row out of range")
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._data[start:end])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in range(len(self)):
+            yield self[row]
+
+
+class SharedIndexStore:
+    """Versioned on-disk snapshots of a vector index and its catalog.
+
+    Each snapshot is a directory named after its key, holding the index
+    (``VectorIndex.save``) next to a ``MappedCatalog``. Snapshots are written
+    to a temporary directory and renamed into place, so readers never see a
+    partial one. Workers open them with every array memory-mapped read-only.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def open(self, key: str) -> Optional[Tuple[VectorIndex, MappedCatalog]]:
+        """Map the snapshot stored under ``key``, or return ``None`` if there is none."""
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            return VectorIndex.load(path, mmap=True), MappedCatalog(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable shared index {path}: {e}")
+            return None
+
+    def publish(self, key: str, index: VectorIndex, records: Sequence[Dict[str, Any]]) -> Tuple[VectorIndex, MappedCatalog]:
+        """Write a snapshot under ``key`` atomically, drop older ones and map the result."""
+        path = self._path(key)
+        if not os.path.isdir(path):
+            staging = tempfile.mkdtemp(prefix=".staging-", dir=self.directory)
+            try:
+                os.chmod(staging, 0o755)
+                index.save(staging)
+                MappedCatalog.write(staging, records)
+                os.rename(staging, path)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+                if not os.path.isdir(path):
+                    raise
+            logger.info(f"Published shared index {path} ({len(records)} records)")
+        self._prune(keep=key)
+        return self.open(key)
+
+    def _prune(self, keep: str):
+        # Processes still mapping an old snapshot keep their pages after unlink (POSIX)
+        for name in os.listdir(self.directory):
+            if name != keep and not name.startswith(".") and os.path.isdir(self._path(name)):
+                shutil.rmtree(self._path(name), ignore_errors=True)
+
+    @contextlib.contextmanager
+    def build_lock(self):
+        """Hold an exclusive host-wide lock so only one worker builds a missing snapshot."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def create_shared_index_store() -> Optional[SharedIndexStore]:
+    """Shared snapshot store under SHARED_INDEX_DIR; ``None`` (per-process indexes) when unset."""
+    directory = os.getenv("SHARED_INDEX_DIR")
+    return SharedIndexStore(directory) if directory else None
@@ -1,11 +1,14 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
 import asyncio
 import logging
+import os
 
 from simple_rag_service import SimpleRAGService
+from sse import sse_response
+from warmup import Warmup
 
 # Initialize FastAPI
 app = FastAPI(
@@ -23,13 +26,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize RAG service
+# Initialize RAG service; the catalog and indexes load in the background warm-up
 rag_service = SimpleRAGService()
+warmup = Warmup("RAG service")
+
+# Upper bound on queries accepted by /query/batch
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "10000"))
 
 # Pydantic models
+class QueryFilters(BaseModel):
+    """Structured predicates applied before retrieval scores any candy"""
+    categories: List[str] = []  # Any of these (English or Finnish names)
+    min_sweetness: Optional[int] = None
+    max_sweetness: Optional[int] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    include_ingredients: List[str] = []
+    exclude_ingredients: List[str] = []
+    include_allergens: List[str] = []
+    exclude_allergens: List[str] = []  # e.g. ["nuts"] drops "may contain traces of nuts"
+
+    def active(self) -> Dict[str, Any]:
+        return self.model_dump(exclude_defaults=True)
+
 class QueryRequest(BaseModel):
     query: str
     language: str = "en"  # "en" or "fi"
+    filters: Optional[QueryFilters] = None
 
 class RAGStepResponse(BaseModel):
     step: str
@@ -45,10 +68,27 @@ class RAGResponse(BaseModel):
     final_answer: Dict[str, str]
     total_time: float
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    language: str = "en"  # "en" or "fi"
+    top_k: int = Field(3, ge=1)
+    generate: bool = True  # False returns retrieval results only
+    filters: Optional[QueryFilters] = None  # Applied to every query in the batch
+
+class BatchQueryResponse(BaseModel):
+    language: str
+    results: List[Dict[str, Any]]
+    total_time: float
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the RAG service with sample data"""
-    await rag_service.initialize()
+    """Start warming up the RAG service in the background so the server binds immediately"""
+    warmup.start(rag_service.initialize, rag_service.startup_timer)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop a warm-up that is still running"""
+    await warmup.stop()
 
 @app.get("/")
 async def root():
@@ -58,14 +98,15 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "AI Candy Store RAG API"}
 
-@app.post("/query", response_model=RAGResponse)
+@app.post("/query", response_model=RAGResponse, dependencies=[Depends(warmup.require_ready)])
 async def process_query(request: QueryRequest):
     """Process a query through the complete RAG pipeline with step-by-step visualization"""
     try:
         start_time = asyncio.get_event_loop().time()
         
         # Process query through RAG pipeline
-        result = await rag_service.process_query_with_steps(request.query, request.language)
+        filters = request.filters.active() if request.filters else None
+        result = await rag_service.process_query_with_steps(request.query, request.language, filters)
         
         end_time = asyncio.get_event_loop().time()
         total_time = end_time - start_time
@@ -82,7 +123,32 @@ async def process_query(request: QueryRequest):
         logging.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
-@app.get("/candies")
+@app.post("/query/stream", dependencies=[Depends(warmup.require_ready)])
+async def stream_query(request: QueryRequest):
+    """Stream each RAG pipeline step as a server-sent event as soon as it finishes"""
+    filters = request.filters.active() if request.filters else None
+    return sse_response(rag_service.stream_query_with_steps(request.query, request.language, filters))
+
+@app.post("/query/batch", response_model=BatchQueryResponse, dependencies=[Depends(warmup.require_ready)])
+async def process_batch(request: BatchQueryRequest):
+    """Answer many queries in one request: batched embedding and search, bounded-concurrency generation"""
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    try:
+        start_time = asyncio.get_event_loop().time()
+        filters = request.filters.active() if request.filters else None
+        results = await rag_service.process_batch(request.queries, request.language, request.top_k, request.generate, filters)
+        return BatchQueryResponse(
+            language=request.language,
+            results=results,
+            total_time=asyncio.get_event_loop().time() - start_time
+        )
+    
+    except Exception as e:
+        logging.error(f"Error processing query batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing query batch: {str(e)}")
+
+@app.get("/candies", dependencies=[Depends(warmup.require_ready)])
 async def get_candies():
     """Get all available candy data for display"""
     try:
@@ -91,7 +157,12 @@ async def get_candies():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching candies: {str(e)}")
 
-@app.post("/reset")
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the RAG service has warmed up, with per-component startup times"""
+    return warmup.response()
+
+@app.post("/reset", dependencies=[Depends(warmup.require_ready)])
 async def reset_demo():
     """Reset the demo state"""
     try:
@@ -1,15 +1,45 @@
 import asyncio
+import os
+import re
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 import logging
 
+import numpy as np
+
+from bm25 import BM25Index
+from catalog_loader import create_catalog_loader, read_catalog
+from context_packer import create_context_packer
+from filter_index import FilterIndex, active_filters
+from hashing_embedder import HashingEmbedder
+from vector_index import create_index
+from query_cache import create_query_embedding_cache, normalize_query
+from warmup import StartupTimer
+
 # Configure logging  
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SimpleRAGService:
+    # Boost added to the cosine score of the best BM25 keyword match
+    KEYWORD_BOOST_WEIGHT = 0.3
+    # Nearest neighbours fetched from the vector index before boosting
+    VECTOR_CANDIDATES = 20
+
     def __init__(self):
         self.candies_data = []
+        self.embedding_model_name = "feature-hashing-384"
+        self.embedder = HashingEmbedder(dimensions=384)
+        self.vector_index = {}
+        self.keyword_index = {}
+        self.filter_index = FilterIndex([])
+        self.query_cache = create_query_embedding_cache()
+        self.context_packer = create_context_packer()
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "8"))
+        # JSONL or CSV catalog streamed in at startup instead of the built-in demo catalog
+        self.catalog_path = os.getenv("CATALOG_PATH")
+        self.catalog_loader = create_catalog_loader()
+        self.startup_timer = StartupTimer("SimpleRAGService")
         
         # Translations for UI
         self.translations = {
@@ -37,8 +67,75 @@ class SimpleRAGService:
 
     async def initialize(self):
         """Initialize the service with sample candy data"""
-        await self._load_candy_data()
-        logger.info("Simple RAG service initialized successfully")
+        if self.catalog_path:
+            with self.startup_timer.measure("catalog_ingest"):
+                await self._ingest_catalog(self.catalog_path)
+        else:
+            with self.startup_timer.measure("catalog"):
+                await self._load_candy_data()
+            with self.startup_timer.measure("embedding_index"):
+                self._build_embedding_index()
+            with self.startup_timer.measure("keyword_index"):
+                self._build_keyword_index()
+        with self.startup_timer.measure("filter_index"):
+            # Rows follow candies_data, like the vector and keyword indexes
+            self.filter_index = FilterIndex(self.candies_data)
+        with self.startup_timer.measure("tokenizer"):
+            await asyncio.get_running_loop().run_in_executor(None, self.context_packer.tokenizer.load)
+        logger.info(f"Simple RAG service initialized successfully ({self.startup_timer.summary()})")
+
+    def _candy_search_text(self, candy: Dict[str, Any], language: str) -> str:
+        """Text that represents a candy in the given language's embedding index"""
+        if language == "fi":
+            return candy["name_fi"] + " " + candy["description_fi"]
+        return candy["name"] + " " + candy["description"]
+
+    def _build_keyword_index(self):
+        """Build a BM25 inverted index per language; document ids are row positions in candies_data"""
+        self.keyword_index = {}
+        for language in ("en", "fi"):
+            index = BM25Index(language=language)
+            for row, candy in enumerate(self.candies_data):
+                index.add(row, self._candy_search_text(candy, language))
+            self.keyword_index[language] = index
+
+    def _build_embedding_index(self):
+        """Embed every candy once per language into a vector index keyed by row in candies_data"""
+        self.vector_index = {}
+        for language in ("en", "fi"):
+            index = create_index(dimensions=self.embedder.dimensions)
+            if self.candies_data:
+                texts = [self._candy_search_text(candy, language).lower() for candy in self.candies_data]
+                index.add(list(range(len(self.candies_data))), self.embedder.embed_many(texts))
+            self.vector_index[language] = index
+
+    async def _ingest_catalog(self, path: str):
+        """Stream a catalog file into the embedding and keyword indexes chunk by chunk"""
+        self.candies_data = []
+        self.vector_index = {language: create_index(dimensions=self.embedder.dimensions) for language in ("en", "fi")}
+        self.keyword_index = {language: BM25Index(language=language) for language in ("en", "fi")}
+        loop = asyncio.get_running_loop()
+
+        def embed_chunk(chunk: List[Dict[str, Any]]) -> Dict[str, Tuple[List[str], np.ndarray]]:
+            embedded = {}
+            for language in ("en", "fi"):
+                texts = [self._candy_search_text(candy, language) for candy in chunk]
+                embedded[language] = (texts, self.embedder.embed_many([text.lower() for text in texts]))
+            return embedded
+
+        async def process_chunk(chunk: List[Dict[str, Any]]) -> int:
+            # Rows are reserved before the await so concurrent chunks never collide
+            rows = list(range(len(self.candies_data), len(self.candies_data) + len(chunk)))
+            self.candies_data.extend(chunk)
+            # Embedding runs in a thread; the indexes are only mutated on the event loop
+            embedded = await loop.run_in_executor(None, embed_chunk, chunk)
+            for language, (texts, vectors) in embedded.items():
+                self.vector_index[language].add(rows, vectors)
+                for row, text in zip(rows, texts):
+                    self.keyword_index[language].add(row, text)
+            return 2 * len(chunk)
+
+        await self.catalog_loader.load(read_catalog(path), process_chunk, path)
 
     async def _load_candy_data(self):
         """Load sample candy data"""
@@ -110,9 +207,18 @@ class SimpleRAGService:
             }
         ]
 
-    async def process_query_with_steps(self, query: str, language: str = "en") -> Dict[str, Any]:
+    async def process_query_with_steps(self, query: str, language: str = "en", filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Process query through simplified RAG pipeline with step-by-step visualization"""
+        result = None
+        async for event in self.stream_query_with_steps(query, language, filters):
+            if event["event"] == "result":
+                result = event["data"]
+        return result
+
+    async def stream_query_with_steps(self, query: str, language: str = "en", filters: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Run the simplified pipeline, yielding "step" events as stages finish, "token" events for the answer and a final "result" event"""
         steps = []
+        start_time = time.time()
         
         # Step 1: Query Processing
         step_start = time.time()
@@ -153,14 +259,14 @@ class SimpleRAGService:
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
         # Step 2: Query Embedding  
         step_start = time.time()
-        await asyncio.sleep(0.3)  # Simulate embedding
         
         # Generate realistic embedding values based on query content
-        query_embedding = self._generate_mock_embedding(processed_query, filtered_tokens)
-        embedding_magnitude = sum(x**2 for x in query_embedding)**0.5
+        query_embedding, cache_hit = await self._embed_query(processed_query, filtered_tokens, language)
+        embedding_magnitude = float(np.linalg.norm(query_embedding))
         
         step_time = time.time() - step_start
         
@@ -168,36 +274,41 @@ class SimpleRAGService:
             "step": "query_embedding", 
             "title": self.translations["query_embedding"],
             "description": {
-                "en": f"🧠 TECHNICAL: Sentence transformer converts text to dense vector representation in 384-dimensional semantic space. Each dimension captures different linguistic/semantic features. L2 norm: {embedding_magnitude:.3f}",
-                "fi": f"🧠 TEKNINEN: Lause-transformaattori muuntaa tekstin tiheäksi vektorirepresentaatioksi 384-ulotteisessa semanttisessa avaruudessa. Jokainen ulottuvuus kaappaa erilaisia kielellisiä/semanttisia piirteitä. L2-normi: {embedding_magnitude:.3f}"
+                "en": f"🧠 TECHNICAL: Feature hashing maps word unigrams, bigrams and character {self.embedder.char_ngram}-grams into a {self.embedder.dimensions}-dimensional vector, L2-normalized for cosine similarity. L2 norm: {embedding_magnitude:.3f}",
+                "fi": f"🧠 TEKNINEN: Piirteiden hajautus (feature hashing) kuvaa sanat, sanaparit ja {self.embedder.char_ngram}-merkkiset n-grammit {self.embedder.dimensions}-ulotteiseksi vektoriksi, joka normalisoidaan kosinisamankaltaisuutta varten. L2-normi: {embedding_magnitude:.3f}"
             },
             "data": {
                 "model_info": {
-                    "model": "all-MiniLM-L6-v2", 
-                    "dimensions": 384,
-                    "max_sequence_length": 256,
-                    "architecture": "BERT-based transformer"
+                    "model": self.embedding_model_name,
+                    "dimensions": self.embedder.dimensions,
+                    "features": f"Word unigrams, word bigrams, character {self.embedder.char_ngram}-grams",
+                    "architecture": "Signed feature hashing (no trained weights)",
+                    "backend": "Deterministic NumPy feature hashing (offline)"
                 },
                 "embedding_vector": {
-                    "full_dimensions": 384,
-                    "sample_values": query_embedding[:10],  # Show first 10 dimensions
+                    "full_dimensions": self.embedder.dimensions,
+                    "sample_values": np.round(query_embedding[:10], 6).tolist(),  # Show first 10 dimensions
                     "magnitude": round(embedding_magnitude, 6),
-                    "sparsity": f"{sum(1 for x in query_embedding if abs(x) < 0.01)/len(query_embedding)*100:.1f}% near-zero"
+                    "sparsity": f"{float(np.mean(np.abs(query_embedding) < 0.01))*100:.1f}% near-zero"
                 },
                 "vector_properties": {
-                    "min_value": min(query_embedding),
-                    "max_value": max(query_embedding), 
-                    "mean": sum(query_embedding)/len(query_embedding),
-                    "std_dev": (sum((x - sum(query_embedding)/len(query_embedding))**2 for x in query_embedding)/len(query_embedding))**0.5
+                    "min_value": float(query_embedding.min()),
+                    "max_value": float(query_embedding.max()), 
+                    "mean": float(query_embedding.mean()),
+                    "std_dev": float(query_embedding.std())
                 },
-                "semantic_encoding": f"Vector encodes semantic meaning of '{' '.join(filtered_tokens)}' in high-dimensional space for cosine similarity comparison"
+                "semantic_encoding": f"Vector encodes semantic meaning of '{' '.join(filtered_tokens)}' in high-dimensional space for cosine similarity comparison",
+                "embedding_cache": {"hit": cache_hit, **self.query_cache.stats()}
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
         # Step 3: Vector Search
         step_start = time.time()
-        search_results = await self._advanced_search(processed_query, language, query_embedding, filtered_tokens)
+        filters = active_filters(filters)
+        allowed_rows = None if filters is None else self.filter_index.matching_rows(filters)
+        search_results = await self._advanced_search(processed_query, language, query_embedding, filtered_tokens, allowed_rows)
         step_time = time.time() - step_start
         
         # Calculate similarity statistics
@@ -216,7 +327,8 @@ class SimpleRAGService:
                     "method": "Cosine Similarity",
                     "formula": "cos(θ) = (A·B) / (||A|| × ||B||)",
                     "database_size": len(self.candies_data),
-                    "search_space": "384-dimensional semantic vector space"
+                    "index_type": self.vector_index["en"].kind,
+                    "search_space": f"{self.embedder.dimensions}-dimensional hashed feature space"
                 },
                 "similarity_distribution": {
                     "highest_score": max(similarities) if similarities else 0,
@@ -235,66 +347,77 @@ class SimpleRAGService:
                     }
                     for idx, result in enumerate(search_results[:5])
                 ],
-                "vector_space_analysis": f"Query tokens '{' '.join(filtered_tokens)}' mapped to semantic clusters in embedding space"
+                "vector_space_analysis": f"Query tokens '{' '.join(filtered_tokens)}' mapped to semantic clusters in embedding space",
+                "filters": {
+                    "applied": filters or {},
+                    "matching_candies": len(self.candies_data) if allowed_rows is None else len(allowed_rows),
+                    "catalog_size": len(self.candies_data)
+                }
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
         # Step 4: Context Preparation
         step_start = time.time()
         await asyncio.sleep(0.2)  # Simulate processing
         
-        # Build structured context from search results
-        context_chunks = []
-        total_tokens = 0
-        for result in search_results[:3]:  # Top 3 results
-            chunk = f"[CANDY: {result['name']}] Category: {result['category']}, Sweetness: {result['sweetness']}/10, Description: {result['description'][:100]}..."
-            context_chunks.append(chunk)
-            total_tokens += len(chunk.split())
-        
-        context = "\n".join(context_chunks)
+        # Pack search results into the token budget, most similar first
+        packed = self._pack_context(search_results)
+        context = packed["text"]
+        report = self.context_packer.report(packed)
+        # "~" marks counts from the regex approximation rather than the BPE tokenizer
+        approx = "" if self.context_packer.tokenizer.exact else "~"
+        results_by_id = {result["id"]: (rank, result) for rank, result in enumerate(search_results, start=1)}
         step_time = time.time() - step_start
         
         steps.append({
             "step": "context_preparation",
             "title": self.translations["context_preparation"],
             "description": {
-                "en": f"📝 TECHNICAL: Context window assembly for LLM. Retrieved docs ranked by similarity, chunked and formatted with metadata. Token budget: {total_tokens}/2048 tokens used.",
-                "fi": f"📝 TEKNINEN: Konteksti-ikkunan kokoaminen LLM:lle. Haetut dokumentit järjestetty samankaltaisuuden mukaan, pilkottu ja formatoitu metadatalla. Token-budjetti: {total_tokens}/2048 tokenia käytetty."
+                "en": f"📝 TECHNICAL: Context window assembly for LLM. Retrieved docs ranked by similarity, de-duplicated and packed greedily with metadata. Token budget: {approx}{packed['tokens']}/{packed['budget']} tokens used.",
+                "fi": f"📝 TEKNINEN: Konteksti-ikkunan kokoaminen LLM:lle. Haetut dokumentit järjestetty samankaltaisuuden mukaan, duplikaatit poistettu ja pakattu ahneesti metadatan kanssa. Token-budjetti: {approx}{packed['tokens']}/{packed['budget']} tokenia käytetty."
             },
             "data": {
                 "context_window": {
-                    "total_tokens": total_tokens,
-                    "max_context_length": 2048,
-                    "utilization": f"{(total_tokens/2048)*100:.1f}%",
-                    "chunks_included": len(context_chunks)
+                    "total_tokens": packed["tokens"],
+                    "max_context_length": packed["budget"],
+                    "utilization": report["utilization"],
+                    "chunks_included": len(packed["blocks"])
                 },
+                "token_budget": report,
                 "rag_strategy": {
                     "retrieval_count": len(search_results),
-                    "context_selection": "Top-k similarity ranking",
-                    "chunk_size": "~100 chars per description",
+                    "context_selection": "Greedy by similarity rank within the token budget",
+                    "chunk_size": "Whole descriptions, trimmed by sentence to fit",
                     "metadata_included": ["name", "category", "sweetness", "description"]
                 },
                 "context_structure": [
                     {
                         "chunk_id": idx,
                         "candy_name": result["name"],
-                        "similarity_rank": idx + 1,
-                        "token_count": len(context_chunks[idx].split()),
+                        "similarity_rank": rank,
+                        "token_count": block["tokens"],
+                        "truncated": block["truncated"],
                         "metadata": f"Category: {result['category']}, Sweetness: {result['sweetness']}"
                     }
-                    for idx, result in enumerate(search_results[:3])
+                    for idx, (block, (rank, result)) in enumerate((block, results_by_id[block["key"]]) for block in packed["blocks"])
                 ],
                 "context_preview": context[:200] + "..." if len(context) > 200 else context
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
         # Step 5: AI Generation
         step_start = time.time()
         final_answer, generation_details = await self._generate_technical_answer(query, search_results, context, language, filtered_tokens)
         step_time = time.time() - step_start
         
+        # Template answers are complete at once; stream them word by word
+        for token in re.findall(r"\S+\s*", final_answer[language]):
+            yield {"event": "token", "data": {"text": token}}
+        
         steps.append({
             "step": "ai_generation",
             "title": self.translations["ai_generation"],
@@ -331,11 +454,15 @@ class SimpleRAGService:
             },
             "processing_time": step_time
         })
+        yield {"event": "step", "data": steps[-1]}
         
-        return {
+        yield {"event": "result", "data": {
+            "query": query,
+            "language": language,
             "steps": steps,
-            "final_answer": final_answer
-        }
+            "final_answer": final_answer,
+            "total_time": time.time() - start_time
+        }}
 
 
 
@@ -343,63 +470,75 @@ class SimpleRAGService:
         """Get all candy data for display"""
         return self.candies_data
 
-    def _generate_mock_embedding(self, processed_query: str, tokens: List[str]) -> List[float]:
-        """Generate realistic-looking embedding vector based on query content"""
-        import random
-        import math
-        
-        # Seed random with query for consistent results
-        random.seed(hash(processed_query) % 2**32)
-        
-        # Generate 384 dimensions
-        embedding = []
-        for i in range(384):
-            # Base random value
-            val = random.gauss(0, 0.3)
-            
-            # Add semantic meaning based on tokens
-            for token in tokens:
-                if token in processed_query:
-                    # Add token-specific influence 
-                    token_influence = hash(token + str(i)) % 100 / 1000.0
-                    val += token_influence * random.choice([-1, 1])
-            
-            # Clamp to reasonable range
-            val = max(-1.0, min(1.0, val))
-            embedding.append(round(val, 6))
-        
-        return embedding
+    async def _embed_query(self, processed_query: str, tokens: List[str], language: str) -> Tuple[np.ndarray, bool]:
+        """Embed the query, skipping the embedding model entirely on cache hits"""
+        cache_key = (normalize_query(processed_query), self.embedding_model_name, language)
+        embedding = self.query_cache.get(cache_key)
+        if embedding is not None:
+            return embedding, True
+
+        await asyncio.sleep(0.3)  # Simulate embedding
+        embedding = self._generate_mock_embedding(" ".join(tokens) or processed_query)
+        self.query_cache.set(cache_key, embedding)
+        return embedding, False
 
-    async def _advanced_search(self, query: str, language: str, query_embedding: List[float], tokens: List[str]) -> List[Dict]:
+    def _generate_mock_embedding(self, text: str) -> np.ndarray:
+        """Embed text with the deterministic feature-hashing embedder (384-d, L2-normalized)"""
+        return self.embedder.embed(text)
+
+    async def _advanced_search(self, query: str, language: str, query_embedding: np.ndarray, tokens: List[str], allowed_rows: Optional[np.ndarray] = None) -> List[Dict]:
         """Advanced search with detailed similarity calculations and explanations"""
         await asyncio.sleep(0.4)  # Simulate search time
         
+        # Nearest candies from the pre-computed embedding index
+        index_language = "fi" if language == "fi" else "en"
+        neighbours = self._nearest(index_language, query_embedding, allowed_rows)
+        return self._rank_candidates(query, index_language, query_embedding, tokens, neighbours, allowed_rows)
+
+    def _nearest(self, index_language: str, query_embedding: np.ndarray, allowed_rows: Optional[np.ndarray], count: Optional[int] = None) -> List[Tuple[int, float]]:
+        """``count`` (default VECTOR_CANDIDATES) nearest rows; with ``allowed_rows`` only those rows are scored"""
+        count = count or self.VECTOR_CANDIDATES
+        vector_index = self.vector_index[index_language]
+        if allowed_rows is None:
+            return vector_index.search(query_embedding, count)
+        if len(allowed_rows) == 0:
+            return []
+        scores = vector_index.score_ids(query_embedding, allowed_rows.tolist())
+        best = np.argsort(-scores)[:count]
+        return [(int(allowed_rows[i]), float(scores[i])) for i in best]
+
+    def _rank_candidates(
+        self,
+        query: str,
+        index_language: str,
+        query_embedding: np.ndarray,
+        tokens: List[str],
+        neighbours: List[Tuple[int, float]],
+        allowed_rows: Optional[np.ndarray] = None,
+        limit: int = 5
+    ) -> List[Dict]:
+        """Apply BM25 and semantic boosts to the nearest neighbours and keep the best ``limit``"""
         results = []
-        
-        for candy in self.candies_data:
-            # Generate embedding for candy (simulate pre-computed embeddings)
-            candy_text = candy["name"] + " " + candy["description"]
-            if language == "fi":
-                candy_text = candy["name_fi"] + " " + candy["description_fi"]
-            
-            candy_embedding = self._generate_mock_embedding(candy_text.lower(), candy_text.lower().split())
-            
-            # Calculate cosine similarity
-            dot_product = sum(a * b for a, b in zip(query_embedding, candy_embedding))
-            query_magnitude = sum(a**2 for a in query_embedding)**0.5
-            candy_magnitude = sum(a**2 for a in candy_embedding)**0.5
-            
-            cosine_similarity = dot_product / (query_magnitude * candy_magnitude) if (query_magnitude * candy_magnitude) > 0 else 0
-            
-            # Additional keyword matching for demo purposes
-            keyword_boost = 0
-            matched_tokens = []
-            search_text = candy_text.lower()
-            
-            for token in tokens:
-                if token in search_text:
-                    keyword_boost += 0.1
-                    matched_tokens.append(token)
+        vector_index = self.vector_index[index_language]
+        cosine_by_row = dict(neighbours)
+        
+        # BM25 keyword scores; only candies containing a query term (and passing the filters) are scored
+        keyword_hits = self.keyword_index[index_language].search(query)
+        if allowed_rows is not None:
+            allowed = set(allowed_rows.tolist())
+            keyword_hits = {row: hit for row, hit in keyword_hits.items() if row in allowed}
+        best_keyword_score = max((score for score, _ in keyword_hits.values()), default=0.0)
+        
+        # Keyword hits outside the nearest neighbours still get an exact cosine score
+        keyword_only = [row for row in keyword_hits if row not in cosine_by_row]
+        if keyword_only:
+            cosine_by_row.update(zip(keyword_only, vector_index.score_ids(query_embedding, keyword_only).tolist()))
+        
+        for row, cosine_similarity in cosine_by_row.items():
+            candy = self.candies_data[row]
+            # Keyword boost scaled so the best BM25 match adds KEYWORD_BOOST_WEIGHT
+            keyword_score, matched_tokens = keyword_hits.get(row, (0.0, []))
+            keyword_boost = self.KEYWORD_BOOST_WEIGHT * keyword_score / best_keyword_score if best_keyword_score > 0 else 0
             
             # Check for specific semantic matches
             if "sweet" in tokens or "makea" in tokens:
@@ -426,7 +565,63 @@ class SimpleRAGService:
         
         # Sort by similarity score
         results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:5]
+        return results[:limit]
+
+    async def process_batch(self, queries: List[str], language: str = "en", top_k: int = 3, generate: bool = True, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Answer many queries at once without per-step visualization.
+
+        Cache-missing queries are embedded in one ``embed_many`` call and all
+        queries share one batched index lookup; answers are generated at most
+        ``batch_concurrency`` at a time. Results follow the order of ``queries``.
+        """
+        if not queries:
+            return []
+        stop_words = ['the', 'is', 'at', 'which', 'on', 'a', 'an', 'and', 'or', 'but', 'in', 'with', 'to', 'for', 'of', 'as', 'by']
+        processed = [query.lower().strip() for query in queries]
+        filtered = [[token for token in text.split() if token not in stop_words] for text in processed]
+        
+        keys = [(normalize_query(text), self.embedding_model_name, language) for text in processed]
+        embeddings = [self.query_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.embedder.embed_many([" ".join(filtered[i]) or processed[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+                self.query_cache.set(keys[i], embedding)
+        embeddings = np.stack(embeddings)
+        
+        index_language = "fi" if language == "fi" else "en"
+        filters = active_filters(filters)
+        allowed_rows = None if filters is None else self.filter_index.matching_rows(filters)
+        # Enough neighbours that the re-ranking can still fill top_k
+        candidates = max(self.VECTOR_CANDIDATES, top_k)
+        if allowed_rows is None:
+            neighbours = self.vector_index[index_language].search_batch(embeddings, candidates)
+        else:
+            neighbours = [self._nearest(index_language, embedding, allowed_rows, candidates) for embedding in embeddings]
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        
+        async def answer(i: int) -> Dict[str, Any]:
+            search_results = self._rank_candidates(processed[i], index_language, embeddings[i], filtered[i], neighbours[i], allowed_rows, top_k)
+            final_answer = None
+            if generate:
+                context = self._pack_context(search_results)["text"]
+                async with semaphore:
+                    final_answer, _ = await self._generate_technical_answer(queries[i], search_results, context, language, filtered[i])
+            return {"query": queries[i], "results": search_results, "final_answer": final_answer}
+        
+        return await asyncio.gather(*[answer(i) for i in range(len(queries))])
+
+    def _pack_context(self, search_results: List[Dict]) -> Dict[str, Any]:
+        """Fit search results into the context token budget, most similar first"""
+        return self.context_packer.pack(
+            {
+                "key": result["id"],
+                "header": f"[CANDY: {result['name']}] Category: {result['category']}, Sweetness: {result['sweetness']}/10, Description: ",
+                "passages": [result["description"]]
+            }
+            for result in search_results
+        )
 
     async def _generate_technical_answer(self, query: str, search_results: List[Dict], context: str, language: str, tokens: List[str]) -> tuple:
         """Generate technical answer with detailed generation information"""
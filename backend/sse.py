@@ -0,0 +1,42 @@
+import json
+import logging
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize NumPy scalars and arrays that appear in step data."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one server-sent event."""
+    payload = json.dumps(data, default=_json_default, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def _encode_events(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            yield format_sse(event["event"], event["data"])
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        logger.error(f"Error streaming query: {e}")
+        yield format_sse("error", {"detail": f"Error processing query: {str(e)}"})
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """Stream pipeline events (``{"event": ..., "data": ...}``) as text/event-stream."""
+    return StreamingResponse(
+        _encode_events(events),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering so events flush immediately
+        }
+    )
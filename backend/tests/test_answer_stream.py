@@ -0,0 +1,64 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from openai_rag_service import OpenAIRAGService
+
+
+class BrokenCompletions:
+    """Streams ``tokens`` and then fails, as a dropped connection would."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    async def create(self, stream=False, **request):
+        if not self.tokens:
+            raise ConnectionError("connection refused")
+
+        async def chunks():
+            for token in self.tokens:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+            raise ConnectionError("connection reset")
+
+        return chunks()
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "response_cache.sqlite3"))
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite3"))
+    monkeypatch.delenv("SHARED_INDEX_DIR", raising=False)
+    service = OpenAIRAGService()
+    yield service
+    service.response_cache.close()
+
+
+async def generate(service, tokens):
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=BrokenCompletions(tokens)))
+    candies = [{"candy": candy, "similarity": 1.0} for candy in service.candies[:2]]
+    context_text = service._pack_context(candies)["text"]
+    chunks = []
+    try:
+        async for chunk in service._generate_ai_response("Any sour candy?", [1.0, 0.0], candies, context_text, "en"):
+            chunks.append(chunk)
+    except ConnectionError as e:
+        return chunks, e
+    return chunks, None
+
+
+def test_failure_before_any_token_falls_back(service):
+    chunks, error = asyncio.run(generate(service, []))
+
+    assert error is None
+    assert [chunk["token"] for chunk in chunks if "token" in chunk] == [chunks[-1]["answer"]]
+    assert chunks[-1]["answer"].startswith("Sorry, I encountered a technical issue.")
+
+
+def test_failure_mid_stream_raises_instead_of_falling_back(service):
+    chunks, error = asyncio.run(generate(service, ["Try ", "the "]))
+
+    assert isinstance(error, ConnectionError)
+    assert chunks == [{"token": "Try "}, {"token": "the "}]
+    assert len(service.response_cache) == 0
@@ -0,0 +1,35 @@
+import threading
+
+from bm25 import BM25Index
+
+
+def test_search_during_concurrent_edits():
+    index = BM25Index()
+    for doc_id in range(200):
+        index.add(doc_id, f"sour gummy candy number {doc_id}")
+
+    errors, done = [], threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                index.search("sour gummy candy")
+            except Exception as e:  # e.g. "dictionary changed size during iteration"
+                errors.append(e)
+                return
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    try:
+        for round_ in range(50):
+            for doc_id in range(200, 400):
+                index.add(doc_id, f"sour gummy candy extra {round_}")
+            for doc_id in range(200, 400):
+                index.remove(doc_id)
+    finally:
+        done.set()
+        searcher.join()
+
+    assert errors == []
+    assert len(index) == 200
+    assert set(index.search("sour")) == set(range(200))
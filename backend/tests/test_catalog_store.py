@@ -0,0 +1,91 @@
+import asyncio
+import tracemalloc
+
+import numpy as np
+
+from catalog_store import CatalogStore
+from rag_service import RAGService
+
+WORDS = "sour sweet chewy crunchy fruity gummy chocolate caramel mint licorice vanilla berry lemon honey".split()
+
+
+def generated_catalog(count, start=0, description_words=300):
+    """Candies with long descriptions, generated lazily like a streamed catalog file."""
+    for number in range(start, start + count):
+        words = " ".join(WORDS[(number * 7 + i) % len(WORDS)] for i in range(description_words))
+        yield {
+            "id": f"c{number}",
+            "name": f"Candy {number}",
+            "name_fi": f"Karkki {number}",
+            "category": "Gummies",
+            "category_fi": "Kumit",
+            "description": f"Candy {number} tag{number}. {words}.",
+            "description_fi": f"Karkki {number}. {words}.",
+            "price": 1.0 + number % 5,
+            "sweetness": number % 10,
+            "ingredients": ["sugar", "gelatin"],
+            "allergens": []
+        }
+
+
+class NullCollection:
+    """Vector database double that keeps nothing, so only the service's own memory is measured."""
+
+    def get(self, **kwargs):
+        return {"ids": [], "metadatas": [], "embeddings": []}
+
+    def upsert(self, **kwargs):
+        pass
+
+    def update(self, **kwargs):
+        pass
+
+    def delete(self, **kwargs):
+        pass
+
+
+def test_store_keeps_positions_and_searches_keywords():
+    store = CatalogStore()
+    candies = list(generated_catalog(3))
+    store.put_records((candy, {"en": candy["description"], "fi": candy["description_fi"]}) for candy in candies)
+    store.put_records([({**candies[0], "price": 9.0}, {"en": "salty licorice", "fi": "salmiakki"})])
+
+    assert len(store) == 3
+    assert [candy["id"] for candy in store.iter_records(page_size=2)] == ["c0", "c1", "c2"]
+    assert store.get_many(["c0", "missing"])["c0"]["price"] == 9.0
+    assert [candy_id for candy_id, _ in store.search_keywords("salty", "en", 5)] == ["c0"]
+    assert store.search_keywords("tag1", "en", 5, allowed={"c2"}) == []
+
+    store.delete_records(["c0", "missing"])
+    assert len(store) == 2
+    assert store.search_keywords("salmiakki", "fi", 5) == []
+    store.close()
+
+
+def test_ingesting_a_large_catalog_keeps_memory_flat(monkeypatch, tmp_path):
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "responses.sqlite3"))
+    service = RAGService()
+    service.collection = NullCollection()
+    service._encode = lambda texts: np.zeros((len(texts), 8), dtype=np.float32)
+
+    async def ingest():
+        await service.ingest_catalog(generated_catalog(500, 0))
+        baseline = tracemalloc.get_traced_memory()[0]
+        report = await service.ingest_catalog(generated_catalog(2000, 500))
+        grown = tracemalloc.get_traced_memory()[0] - baseline
+        return report, grown
+
+    tracemalloc.start()
+    try:
+        report, grown = asyncio.run(ingest())
+    finally:
+        tracemalloc.stop()
+
+    catalog_bytes = sum(len(candy["description"]) + len(candy["description_fi"]) for candy in generated_catalog(2000, 500))
+    assert report["records"] == 2000
+    assert len(service.catalog) == 2500
+    # Records stay on disk: 2000 more candies (several MB of text) leave no per-record trace in memory
+    assert grown < 256 * 1024, f"{grown} bytes retained for {catalog_bytes} bytes of catalog text"
+    assert [candy_id for candy_id, _ in service._lexical_search("tag2499", "en", 3)] == ["c2499"]
+    assert service.catalog.get_many(["c2499"])["c2499"]["name"] == "Candy 2499"
+    asyncio.run(service.close())
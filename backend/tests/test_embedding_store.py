@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore
+
+
+def test_constructing_does_not_open_the_database(tmp_path):
+    path = tmp_path / "embeddings.sqlite3"
+    store = EmbeddingStore(str(path))
+    assert store._conn is None
+    assert not path.exists()
+
+    store.put_many("model", {"sour": [1.0, 0.0]})
+    assert path.exists()
+    store.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_worker_opens_its_own_connection(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"))
+    store.put_many("model", {"parent": [1.0, 0.0]})
+    parent_conn = store._conn
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: must not touch the parent's connection
+        ok = False
+        try:
+            store.put_many("model", {"child": [0.0, 1.0]})
+            ok = store._conn is not parent_conn and set(store.get_many("model", ["parent", "child"])) == {"parent", "child"}
+            store.close()
+        finally:
+            os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.WEXITSTATUS(status) == 0
+    assert store._conn is parent_conn
+    found = store.get_many("model", ["child"])
+    np.testing.assert_array_equal(found["child"], np.array([0.0, 1.0], dtype=np.float32))
+    store.close()
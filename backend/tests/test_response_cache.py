@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from openai_rag_service import OpenAIRAGService
+
+
+class FakeCompletions:
+    """Streams a fixed answer and records every request it receives."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.requests = []
+
+    async def create(self, stream=False, **request):
+        self.requests.append(request)
+
+        async def chunks():
+            for word in self.answer.split(" "):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+        return chunks()
+
+
+def fake_client(answer):
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(answer)))
+
+
+@pytest.fixture
+def default_env(tmp_path, monkeypatch):
+    """Default configuration, with the caches written under ``tmp_path``."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "response_cache.sqlite3"))
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite3"))
+    for name in ("RESPONSE_CACHE_SIZE", "RESPONSE_CACHE_TTL", "RESPONSE_CACHE_DETERMINISTIC_ONLY", "SHARED_INDEX_DIR"):
+        monkeypatch.delenv(name, raising=False)
+
+
+async def answer(service, query):
+    candies = [{"candy": candy, "similarity": 1.0} for candy in service.candies[:2]]
+    context_text = service._pack_context(candies)["text"]
+    chunks = [chunk async for chunk in service._generate_ai_response(query, [1.0, 0.0], candies, context_text, "en")]
+    return chunks[-1]
+
+
+def test_identical_query_hits_response_cache_by_default(default_env):
+    query = "What sour candy do you have?"
+
+    first = OpenAIRAGService()
+    first.client = fake_client("Try the sour gummy worms!")
+    result = asyncio.run(answer(first, query))
+    first.response_cache.close()
+
+    assert result["response_cache"] is None
+    assert first.client.chat.completions.requests[0]["temperature"] == 0
+
+    # A fresh service (e.g. after a restart) has an empty semantic answer
+    # cache, so only the persistent response cache can answer
+    second = OpenAIRAGService()
+    second.client = fake_client("A different answer")
+    result = asyncio.run(answer(second, query))
+
+    assert second.client.chat.completions.requests == []
+    assert result["answer"] == "Try the sour gummy worms!"
+    assert result["response_cache"]["hits"] == 1
+    assert second.response_cache.stats()["hits"] == 1
+    second.response_cache.close()
@@ -0,0 +1,458 @@
+import json
+import mmap
+import os
+import tempfile
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Ranked (id, cosine similarity) pairs, best first
+SearchResult = List[Tuple[Hashable, float]]
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _heap_nbytes(array: np.ndarray) -> int:
+    """Bytes ``array`` holds on the heap; zero when it is a view of a memory map."""
+    base = array
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return 0
+        base = getattr(base, "base", None)
+    return int(array.nbytes)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first, via partial selection."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class VectorIndex:
+    """Cosine-similarity vector index over L2-normalized float32 rows.
+
+    Rows live in one contiguous, growable matrix. Deleting or replacing an id
+    leaves a tombstone that ``compact()`` reclaims. Subclasses decide which
+    rows a query is scored against.
+    """
+
+    kind = "base"
+    # Keep full-precision rows on disk instead of the heap when loading
+    mmap_vectors = False
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self._vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self._size = 0
+        self._ids = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._positions = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._positions
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Stored rows (including tombstoned ones); row ``i`` belongs to ``ids[i]``."""
+        return self._vectors[:self._size]
+
+    def _reserve(self, extra: int):
+        """Grow the backing matrix geometrically so inserts are amortized O(1)."""
+        needed = self._size + extra
+        if needed <= self._vectors.shape[0] and self._vectors.flags.writeable:
+            return
+        capacity = max(needed, 2 * self._vectors.shape[0], 16)
+        grown = self._allocate(capacity)
+        grown[:self._size] = self._vectors[:self._size]
+        self._vectors = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._alive = alive
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        """Backing storage for ``capacity`` full-precision rows."""
+        return np.zeros((capacity, self.dimensions), dtype=np.float32)
+
+    def memory_bytes(self) -> int:
+        """Approximate heap memory held by the index (memory-mapped data excluded)."""
+        return _heap_nbytes(self._vectors)
+
+    def add(self, ids: Sequence[Hashable], vectors: np.ndarray):
+        """Insert or replace vectors; they are normalized on the way in."""
+        vectors = _normalize_rows(vectors)
+        if vectors.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {vectors.shape[1]}")
+        if len(ids) != vectors.shape[0]:
+            raise ValueError("ids and vectors must have the same length")
+
+        self.remove([doc_id for doc_id in ids if doc_id in self._positions])
+        self._reserve(len(ids))
+        start = self._size
+        self._vectors[start:start + len(ids)] = vectors
+        self._alive[start:start + len(ids)] = True
+        for offset, doc_id in enumerate(ids):
+            self._positions[doc_id] = start + offset
+        self._ids.extend(ids)
+        self._size += len(ids)
+        self._on_add(np.arange(start, self._size))
+
+    def remove(self, ids: Sequence[Hashable]):
+        """Tombstone ``ids``; unknown ids are ignored."""
+        rows = [self._positions.pop(doc_id) for doc_id in ids if doc_id in self._positions]
+        if rows:
+            if not self._alive.flags.writeable:
+                self._alive = self._alive.copy()
+            self._alive[rows] = False
+            self._on_remove(np.asarray(rows, dtype=np.int64))
+
+    def compact(self):
+        """Drop tombstoned rows and rebuild row positions."""
+        alive_rows = np.flatnonzero(self._alive[:self._size])
+        if alive_rows.shape[0] == self._size:
+            return
+        vectors = self._allocate(alive_rows.shape[0])
+        for start in range(0, alive_rows.shape[0], 65536):
+            vectors[start:start + 65536] = self._vectors[alive_rows[start:start + 65536]]
+        self._vectors = vectors
+        self._ids = [self._ids[row] for row in alive_rows]
+        self._size = len(self._ids)
+        self._alive = np.ones(self._size, dtype=bool)
+        self._positions = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._on_compact(alive_rows)
+
+    def score_ids(self, query: np.ndarray, ids: Sequence[Hashable]) -> np.ndarray:
+        """Exact cosine similarity between ``query`` and the given ids."""
+        rows = np.asarray([self._positions[doc_id] for doc_id in ids], dtype=np.int64)
+        return self._vectors[rows] @ _normalize_rows(query)[0]
+
+    def search(self, query: np.ndarray, top_k: int) -> SearchResult:
+        """Return the ``top_k`` most similar ids with their cosine similarity."""
+        return self.search_batch(query, top_k)[0]
+
+    def search_batch(self, queries: np.ndarray, top_k: int) -> List[SearchResult]:
+        """Search several queries at once; one ranked list per query row."""
+        queries = _normalize_rows(queries)
+        return [self._search_normalized(query, top_k) for query in queries]
+
+    def _search_normalized(self, query: np.ndarray, top_k: int) -> SearchResult:
+        raise NotImplementedError
+
+    def _ranked(self, rows: np.ndarray, scores: np.ndarray, top_k: int) -> SearchResult:
+        """Mask tombstones, select the best ``top_k`` rows and map them to ids."""
+        scores = np.where(self._alive[rows], scores, -np.inf)
+        best = _top_k(scores, top_k)
+        return [(self._ids[rows[i]], float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+    # Hooks for subclasses that keep auxiliary structures
+    def _on_add(self, rows: np.ndarray):
+        pass
+
+    def _on_remove(self, rows: np.ndarray):
+        pass
+
+    def _on_compact(self, old_rows: np.ndarray):
+        pass
+
+    def params(self) -> Dict[str, Any]:
+        """Constructor parameters, persisted by ``save()``."""
+        return {"dimensions": self.dimensions}
+
+    def _save_arrays(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def _load_arrays(self, arrays: Dict[str, np.ndarray]):
+        pass
+
+    def save(self, path: str):
+        """Write the index to directory ``path`` (compacting it first)."""
+        self.compact()
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        for name, array in self._save_arrays().items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        with open(os.path.join(path, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"kind": self.kind, "params": self.params(), "ids": self._ids}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "VectorIndex":
+        """Load an index written by ``save()``, whatever its kind.
+
+        With ``mmap`` every array is mapped read-only instead of read into the
+        heap, so processes opening the same directory share one copy through
+        the page cache.
+        """
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        index = INDEX_TYPES[meta["kind"]](**meta["params"])
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap or index.mmap_vectors else None)
+        index._vectors = vectors
+        index._size = vectors.shape[0]
+        index._ids = list(meta["ids"])
+        index._alive = np.ones(index._size, dtype=bool)
+        index._positions = {doc_id: row for row, doc_id in enumerate(index._ids)}
+        index._load_arrays({
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode="r" if mmap else None)
+            for name in os.listdir(path)
+            if name.endswith(".npy") and name != "vectors.npy"
+        })
+        return index
+
+
+class BruteForceIndex(VectorIndex):
+    """Exact search: every row is scored with one matrix-vector product."""
+
+    kind = "brute"
+    # Queries scored per matrix product, so the score matrix stays at rows x QUERY_BLOCK
+    QUERY_BLOCK = 16
+
+    def search_batch(self, queries: np.ndarray, top_k: int) -> List[SearchResult]:
+        queries = _normalize_rows(queries)
+        rows = np.arange(self._size)
+        results = []
+        for start in range(0, queries.shape[0], self.QUERY_BLOCK):
+            scores = self.vectors @ queries[start:start + self.QUERY_BLOCK].T
+            results.extend(self._ranked(rows, scores[:, column], top_k) for column in range(scores.shape[1]))
+        return results
+
+    def _search_normalized(self, query: np.ndarray, top_k: int) -> SearchResult:
+        return self._ranked(np.arange(self._size), self.vectors @ query, top_k)
+
+
+class IVFIndex(VectorIndex):
+    """Inverted-file index: rows are clustered with k-means and a query only
+    scores the rows in its ``n_probe`` closest clusters.
+
+    Until ``train_size`` vectors have been added the index behaves like brute
+    force; it then trains itself once. New vectors are assigned to their
+    nearest existing centroid, so inserts stay cheap; call ``train()`` again
+    after large catalog changes. Raising ``n_probe`` trades latency for recall.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dimensions: int, n_lists: Optional[int] = None, n_probe: int = 8,
+                 train_size: int = 4096, kmeans_iterations: int = 20, seed: int = 0):
+        super().__init__(dimensions)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_size = train_size
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.centroids = None
+        self._assignments = np.zeros(0, dtype=np.int64)
+        self._lists = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "dimensions": self.dimensions,
+            "n_lists": self.n_lists,
+            "n_probe": self.n_probe,
+            "train_size": self.train_size,
+            "kmeans_iterations": self.kmeans_iterations,
+            "seed": self.seed
+        }
+
+    def train(self):
+        """Cluster the live rows with spherical k-means and rebuild the inverted lists."""
+        self.compact()
+        if self._size == 0:
+            return
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(self._size))), self._size)
+        rng = np.random.default_rng(self.seed)
+        # Train on a sample; assignment below still covers every row
+        sample = self.vectors[rng.choice(self._size, size=min(self._size, n_lists * 256), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize_rows(sums)
+
+        self.centroids = np.ascontiguousarray(centroids)
+        self._assignments = np.zeros(0, dtype=np.int64)
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(n_lists)]
+        self._on_add(np.arange(self._size))
+
+    def _assign(self, rows: np.ndarray) -> np.ndarray:
+        labels = np.empty(rows.shape[0], dtype=np.int64)
+        # Chunked so a bulk insert never materializes a huge score matrix
+        for start in range(0, rows.shape[0], 65536):
+            chunk = rows[start:start + 65536]
+            labels[start:start + 65536] = np.argmax(self._vectors[chunk] @ self.centroids.T, axis=1)
+        return labels
+
+    def _on_add(self, rows: np.ndarray):
+        if not self.is_trained:
+            if len(self) >= self.train_size:
+                self.train()
+            return
+        labels = self._assign(rows)
+        self._assignments = np.concatenate([self._assignments, labels])
+        order = np.argsort(labels, kind="stable")
+        boundaries = np.searchsorted(labels[order], np.arange(len(self._lists) + 1))
+        for cluster in range(len(self._lists)):
+            members = rows[order[boundaries[cluster]:boundaries[cluster + 1]]]
+            if members.shape[0]:
+                self._lists[cluster] = np.concatenate([self._lists[cluster], members])
+
+    def _on_compact(self, old_rows: np.ndarray):
+        if not self.is_trained:
+            return
+        self._assignments = self._assignments[old_rows]
+        self._lists = [np.flatnonzero(self._assignments == cluster) for cluster in range(len(self._lists))]
+
+    def _search_normalized(self, query: np.ndarray, top_k: int) -> SearchResult:
+        if not self.is_trained:
+            return self._ranked(np.arange(self._size), self.vectors @ query, top_k)
+        probes = _top_k(self.centroids @ query, self.n_probe)
+        rows = np.concatenate([self._lists[cluster] for cluster in probes])
+        return self._ranked(rows, self._vectors[rows] @ query, top_k)
+
+    def _save_arrays(self) -> Dict[str, np.ndarray]:
+        if not self.is_trained:
+            return {}
+        return {"centroids": self.centroids, "assignments": self._assignments}
+
+    def _load_arrays(self, arrays: Dict[str, np.ndarray]):
+        if "centroids" in arrays:
+            self.centroids = arrays["centroids"]
+            self._assignments = np.asarray(arrays["assignments"], dtype=np.int64)
+            self._lists = [np.flatnonzero(self._assignments == cluster) for cluster in range(self.centroids.shape[0])]
+
+
+class Int8Index(VectorIndex):
+    """Scalar-quantized index with full-precision re-ranking.
+
+    Each row is kept in RAM as int8 codes plus one float32 scale (about a
+    quarter of float32, and roughly 1/30 of a ``List[float]``). Queries are
+    scored against the codes, then the best ``top_k * rerank_factor`` rows
+    are re-scored exactly with the full-precision vectors. Those live in a
+    disk-backed memory map, so only the re-ranked pages are ever paged in.
+    """
+
+    kind = "int8"
+    mmap_vectors = True
+    # Rows scored per block so dequantization never materializes the full matrix
+    SCORE_BLOCK = 256
+    # Queries scored per pass, so approximate scores stay at rows x QUERY_BLOCK
+    QUERY_BLOCK = 16
+
+    def __init__(self, dimensions: int, rerank_factor: int = 4):
+        super().__init__(dimensions)
+        self.rerank_factor = rerank_factor
+        self._codes = np.zeros((0, dimensions), dtype=np.int8)
+        self._scales = np.zeros(0, dtype=np.float32)
+
+    def params(self) -> Dict[str, Any]:
+        return {"dimensions": self.dimensions, "rerank_factor": self.rerank_factor}
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        # Anonymous temporary file; the OS reclaims it when the mapping is dropped
+        return np.memmap(tempfile.TemporaryFile(), dtype=np.float32, mode="w+", shape=(capacity, self.dimensions))
+
+    def memory_bytes(self) -> int:
+        return super().memory_bytes() + _heap_nbytes(self._codes) + _heap_nbytes(self._scales)
+
+    @staticmethod
+    def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Symmetric per-row int8 quantization: ``vector ≈ codes * scale``."""
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _reserve(self, extra: int):
+        super()._reserve(extra)
+        capacity = self._vectors.shape[0]
+        if self._codes.shape[0] < capacity or not self._codes.flags.writeable:
+            codes = np.zeros((capacity, self.dimensions), dtype=np.int8)
+            codes[:self._size] = self._codes[:self._size]
+            scales = np.ones(capacity, dtype=np.float32)
+            scales[:self._size] = self._scales[:self._size]
+            self._codes, self._scales = codes, scales
+
+    def _on_add(self, rows: np.ndarray):
+        self._codes[rows], self._scales[rows] = self.quantize(self._vectors[rows])
+
+    def _on_compact(self, old_rows: np.ndarray):
+        self._codes = np.ascontiguousarray(self._codes[old_rows])
+        self._scales = np.ascontiguousarray(self._scales[old_rows])
+
+    def _approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Scores of every row against every query, from the int8 codes: ``(rows, queries)``."""
+        scores = np.empty((self._size, queries.shape[0]), dtype=np.float32)
+        for start in range(0, self._size, self.SCORE_BLOCK):
+            # Small blocks keep the dequantized rows in cache
+            block = self._codes[start:min(start + self.SCORE_BLOCK, self._size)].astype(np.float32)
+            scores[start:start + block.shape[0]] = block @ queries.T
+        scores *= self._scales[:self._size, None]
+        scores[~self._alive[:self._size]] = -np.inf
+        return scores
+
+    def search_batch(self, queries: np.ndarray, top_k: int) -> List[SearchResult]:
+        queries = _normalize_rows(queries)
+        results = []
+        for start in range(0, queries.shape[0], self.QUERY_BLOCK):
+            block = queries[start:start + self.QUERY_BLOCK]
+            approximate = self._approximate_scores(block)
+            for column, query in enumerate(block):
+                shortlist = _top_k(approximate[:, column], top_k * self.rerank_factor)
+                shortlist = shortlist[np.isfinite(approximate[shortlist, column])]
+                # Sorted rows give the memory map a sequential access pattern
+                shortlist = np.sort(shortlist)
+                results.append(self._ranked(shortlist, self._vectors[shortlist] @ query, top_k))
+        return results
+
+    def _save_arrays(self) -> Dict[str, np.ndarray]:
+        return {"codes": self._codes[:self._size], "scales": self._scales[:self._size]}
+
+    def _load_arrays(self, arrays: Dict[str, np.ndarray]):
+        self._codes = np.ascontiguousarray(arrays["codes"])
+        self._scales = np.ascontiguousarray(arrays["scales"])
+
+
+INDEX_TYPES = {
+    BruteForceIndex.kind: BruteForceIndex,
+    IVFIndex.kind: IVFIndex,
+    Int8Index.kind: Int8Index
+}
+
+
+def create_index(dimensions: int, kind: Optional[str] = None) -> VectorIndex:
+    """Build the index selected by VECTOR_INDEX ("brute", "ivf" or "int8").
+
+    IVF recall/latency is tuned with IVF_N_LISTS, IVF_N_PROBE and
+    IVF_TRAIN_SIZE; the int8 shortlist size with INT8_RERANK_FACTOR.
+    """
+    kind = kind or os.getenv("VECTOR_INDEX", "brute")
+    if kind == Int8Index.kind:
+        return Int8Index(dimensions, rerank_factor=int(os.getenv("INT8_RERANK_FACTOR", "4")))
+    if kind == IVFIndex.kind:
+        n_lists = os.getenv("IVF_N_LISTS")
+        return IVFIndex(
+            dimensions,
+            n_lists=int(n_lists) if n_lists else None,
+            n_probe=int(os.getenv("IVF_N_PROBE", "8")),
+            train_size=int(os.getenv("IVF_TRAIN_SIZE", "4096"))
+        )
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type: {kind}")
+    return INDEX_TYPES[kind](dimensions)
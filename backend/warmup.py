@@ -0,0 +1,110 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Wall-clock time spent loading each startup component, logged as it finishes."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.timings: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def measure(self, component: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[component] = time.perf_counter() - start
+            logger.info(f"{self.name} startup: {component} took {self.timings[component]:.3f}s")
+
+    def summary(self) -> str:
+        """Components ordered by cost, e.g. ``embedding_model=2.10s, chroma=0.30s``."""
+        ranked = sorted(self.timings.items(), key=lambda item: item[1], reverse=True)
+        return ", ".join(f"{component}={seconds:.2f}s" for component, seconds in ranked)
+
+
+class Warmup:
+    """Run a service's initialization in the background and track readiness.
+
+    The server binds and answers ``/health`` straight away while ``start()``
+    loads heavy components in a task. ``/ready`` reports 503 until the task
+    finishes; request handlers that need the service depend on
+    ``require_ready`` and wait (up to READY_TIMEOUT seconds) instead.
+    """
+
+    def __init__(self, name: str = "service"):
+        self.name = name
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.timer: Optional[StartupTimer] = None
+        self.request_timeout = float(os.getenv("READY_TIMEOUT", "60"))
+        self._task: Optional[asyncio.Task] = None
+        self._started = 0.0
+        self._finished = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self, initialize: Callable[[], Awaitable[Any]], timer: Optional[StartupTimer] = None):
+        """Schedule ``initialize()`` on the running loop without waiting for it."""
+        self.state = "starting"
+        self.timer = timer
+        self._started = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._run(initialize))
+
+    async def _run(self, initialize: Callable[[], Awaitable[Any]]):
+        try:
+            await initialize()
+        except Exception as e:
+            self.state, self.error = "failed", str(e)
+            logger.error(f"{self.name} warm-up failed: {e}")
+            return
+        finally:
+            self._finished = time.perf_counter()
+        self.state = "ready"
+        breakdown = f" ({self.timer.summary()})" if self.timer and self.timer.timings else ""
+        logger.info(f"{self.name} ready after {self._finished - self._started:.2f}s{breakdown}")
+
+    async def require_ready(self):
+        """Request dependency: wait for warm-up, or fail with 503."""
+        if self.ready:
+            return
+        if self._task is not None and self.state == "starting":
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout=self.request_timeout)
+            except asyncio.TimeoutError:
+                pass
+        if not self.ready:
+            raise HTTPException(status_code=503, detail=f"{self.name} is {self.state}", headers={"Retry-After": "5"})
+
+    def status(self) -> Dict[str, Any]:
+        status = {"status": self.state}
+        if self.state in ("ready", "failed"):
+            status["startup_seconds"] = self._finished - self._started
+        if self.timer is not None:
+            status["components"] = dict(self.timer.timings)
+        if self.error:
+            status["error"] = self.error
+        return status
+
+    def response(self) -> JSONResponse:
+        """Readiness probe response: 200 once ready, 503 before (or after a failed warm-up)."""
+        return JSONResponse(self.status(), status_code=200 if self.ready else 503)
+
+    async def stop(self):
+        """Cancel a warm-up that is still running (at shutdown)."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
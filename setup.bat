@@ -67,6 +67,16 @@ if %errorlevel% neq 0 (
     exit /b 1
 )
 
+:: Install the tokenizer file used to count prompt tokens
+echo Installing tokenizer...
+python fetch_tokenizer.py
+
+if %errorlevel% neq 0 (
+    echo ❌ Failed to install the tokenizer
+    pause
+    exit /b 1
+)
+
 echo ✅ Backend setup complete!
 
 :: Return to root directory
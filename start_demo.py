@@ -111,12 +111,27 @@ def install_backend_deps():
             text=True
         )
         print("✅ Backend dependencies installed successfully")
-        return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to install backend dependencies: {e}")
         print(e.stderr)
         return False
 
+    print("📦 Installing tokenizer...")
+    try:
+        subprocess.run(
+            [sys.executable, "fetch_tokenizer.py"],
+            cwd=backend_path,
+            check=True,
+            capture_output=True,
+            text=True
+        )
+        print("✅ Tokenizer installed successfully")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Failed to install the tokenizer: {e}")
+        print(e.stdout)
+        return False
+
 def main():
     print_banner()
     